@@ -0,0 +1,5 @@
+from .io import read_bitstream, write_bitstream, BinaryBitstream, FORMATS
+from .optimize import compact_bitstream
+from .util import decode_addr, encode_addr
+from .partition import partition_bitstream, channel_summary
+from .diff import diff_bitstream
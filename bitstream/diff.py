@@ -0,0 +1,26 @@
+"""Differential bitstreams for switching between apps on a configured array"""
+from typing import Dict, Iterable, Tuple
+from .optimize import merge_writes, sort_by_tile
+
+
+def diff_bitstream(previous: Iterable[Tuple[int, int]],
+                   current: Iterable[Tuple[int, int]],
+                   reset_values: Dict[int, int] = None,
+                   tile_id_width: int = 16, skip=None):
+    """
+    Returns the writes that take an array configured with @previous to the
+    state a reset array reaches with @current. Registers only @previous
+    writes are explicitly put back to their reset value (0 unless listed in
+    @reset_values). Writes are merged the same way compact_bitstream() does,
+    and returned in tile order.
+    """
+    reset_values = {} if reset_values is None else reset_values
+    previous = dict(merge_writes(previous, skip))
+    current = dict(merge_writes(current, skip))
+    result = []
+    for addr in previous.keys() | current.keys():
+        reset_value = reset_values.get(addr, 0)
+        data = current.get(addr, reset_value)
+        if previous.get(addr, reset_value) != data:
+            result.append((addr, data))
+    return sort_by_tile(result, tile_id_width)
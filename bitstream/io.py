@@ -0,0 +1,152 @@
+"""Reading and writing configuration bitstreams
+
+Two formats are supported:
+  * text: one "AAAAAAAA DDDDDDDD" hex line per config write
+  * binary: a fixed header followed by packed little-endian uint32
+    (address, data) pairs. The header stores the array dimensions, the tile
+    id width, the number of writes and the crc32 of the payload.
+"""
+import mmap
+import struct
+import zlib
+from typing import Iterable, Tuple
+
+
+BINARY_MAGIC = b"GBS\x00"
+BINARY_VERSION = 1
+# magic, version, width, height, tile_id_width, num_entries, crc32
+_HEADER = struct.Struct("<4sHHHHII")
+_ENTRY = struct.Struct("<II")
+# number of entries packed per write() call
+_CHUNK_SIZE = 4096
+
+FORMATS = ("text", "binary")
+
+
+def _write_text(f, bitstream):
+    sep = ""
+    for addr, data in bitstream:
+        f.write("{0}{1:08X} {2:08X}".format(sep, addr, data))
+        sep = "\n"
+
+
+def _write_binary(f, bitstream, width, height, tile_id_width):
+    # the header is patched once the entries have been streamed out
+    f.write(b"\x00" * _HEADER.size)
+    num_entries = 0
+    crc = 0
+    chunk = []
+    for entry in bitstream:
+        chunk.extend(entry)
+        if len(chunk) == 2 * _CHUNK_SIZE:
+            payload = struct.pack(f"<{len(chunk)}I", *chunk)
+            crc = zlib.crc32(payload, crc)
+            f.write(payload)
+            num_entries += _CHUNK_SIZE
+            chunk = []
+    if chunk:
+        payload = struct.pack(f"<{len(chunk)}I", *chunk)
+        crc = zlib.crc32(payload, crc)
+        f.write(payload)
+        num_entries += len(chunk) // 2
+    f.seek(0)
+    f.write(_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, width, height,
+                         tile_id_width, num_entries, crc))
+
+
+def write_bitstream(filename: str, bitstream: Iterable[Tuple[int, int]],
+                    fmt: str = "text", width: int = 0, height: int = 0,
+                    tile_id_width: int = 16):
+    """
+    Writes @bitstream, any iterable of (addr, data), without materializing it.
+    The array dimensions are only recorded by the binary format.
+    """
+    if fmt == "text":
+        with open(filename, "w+") as f:
+            _write_text(f, bitstream)
+    elif fmt == "binary":
+        with open(filename, "wb+") as f:
+            _write_binary(f, bitstream, width, height, tile_id_width)
+    else:
+        raise ValueError(f"Unknown bitstream format {fmt}")
+
+
+class BinaryBitstream:
+    """
+    Memory-maps a binary bitstream. Entries are decoded lazily when iterated
+    or indexed, so arbitrarily large bitstreams can be streamed to the host
+    driver without loading them.
+    """
+    def __init__(self, filename: str):
+        self.__file = open(filename, "rb")
+        self.__mmap = mmap.mmap(self.__file.fileno(), 0,
+                                access=mmap.ACCESS_READ)
+        if len(self.__mmap) < _HEADER.size:
+            self.close()
+            raise ValueError(f"{filename} is not a binary bitstream")
+        magic, version, self.width, self.height, self.tile_id_width, \
+            self.num_entries, self.checksum = \
+            _HEADER.unpack_from(self.__mmap, 0)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            self.close()
+            raise ValueError(f"{filename} is not a binary bitstream")
+        if len(self.__mmap) != _HEADER.size + \
+                self.num_entries * _ENTRY.size:
+            self.close()
+            raise ValueError(f"{filename} is truncated")
+
+    def __len__(self):
+        return self.num_entries
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += self.num_entries
+        if not 0 <= index < self.num_entries:
+            raise IndexError(index)
+        return _ENTRY.unpack_from(self.__mmap,
+                                  _HEADER.size + index * _ENTRY.size)
+
+    def __iter__(self):
+        payload = memoryview(self.__mmap)[_HEADER.size:]
+        try:
+            yield from _ENTRY.iter_unpack(payload)
+        finally:
+            payload.release()
+
+    def verify(self):
+        payload = memoryview(self.__mmap)[_HEADER.size:]
+        try:
+            return zlib.crc32(payload) == self.checksum
+        finally:
+            payload.release()
+
+    def close(self):
+        self.__mmap.close()
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def is_binary_bitstream(filename: str):
+    with open(filename, "rb") as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def read_bitstream(filename: str):
+    """Reads a bitstream in either format into a list of (addr, data)"""
+    if is_binary_bitstream(filename):
+        with BinaryBitstream(filename) as bs:
+            return list(bs)
+    result = []
+    with open(filename) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            addr, data = line.split()
+            result.append((int(addr, 16), int(data, 16)))
+    return result
@@ -0,0 +1,49 @@
+"""Bitstream compaction passes"""
+from typing import Dict, Iterable, List, Tuple
+from .util import tile_id
+
+
+def merge_writes(bitstream: Iterable[Tuple[int, int]], skip=None):
+    """
+    Merges writes to the same register. Routing and core configuration
+    fields are packed into 32-bit registers and every field is emitted as a
+    separate write, so the writes are OR-ed together. Addresses in @skip
+    (e.g. SRAM contents) keep their last write instead.
+    """
+    skip = set() if skip is None else set(skip)
+    result = {}
+    for addr, data in bitstream:
+        if addr in skip or addr not in result:
+            result[addr] = data
+        else:
+            result[addr] |= data
+    return list(result.items())
+
+
+def drop_reset_writes(bitstream: List[Tuple[int, int]],
+                      reset_values: Dict[int, int] = None):
+    """
+    Drops writes of the register's reset value. Registers not listed in
+    @reset_values reset to 0. Only valid if the array is reset before it is
+    configured.
+    """
+    reset_values = {} if reset_values is None else reset_values
+    return [(addr, data) for addr, data in bitstream
+            if data != reset_values.get(addr, 0)]
+
+
+def sort_by_tile(bitstream: List[Tuple[int, int]], tile_id_width: int = 16):
+    # tile ids are (x, y), so this also groups tiles by column
+    return sorted(bitstream, key=lambda entry: (tile_id(entry[0],
+                                                        tile_id_width),
+                                                entry[0] >> tile_id_width))
+
+
+def compact_bitstream(bitstream: Iterable[Tuple[int, int]],
+                      tile_id_width: int = 16, drop_reset: bool = True,
+                      reset_values: Dict[int, int] = None, skip=None):
+    """Merges, optionally drops reset-value writes and orders by tile"""
+    result = merge_writes(bitstream, skip)
+    if drop_reset:
+        result = drop_reset_writes(result, reset_values)
+    return sort_by_tile(result, tile_id_width)
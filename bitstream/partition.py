@@ -0,0 +1,52 @@
+"""Splitting a bitstream over the global buffer's parallel config channels
+
+The global buffer drives num_cfg = ceil(width / 4) configuration channels
+(glb_to_cgra_config), each wired to a contiguous group of columns. Every
+write has to go through the channel of its tile's column, so the channel
+images can be loaded concurrently and configuration time is bounded by the
+longest one.
+"""
+import math
+from typing import Iterable, List, Tuple
+from .util import tile_xy
+
+
+def columns_per_channel(width: int, num_channels: int):
+    return math.ceil(width / num_channels)
+
+
+def config_channel(addr: int, width: int, num_channels: int,
+                   tile_id_width: int = 16):
+    x, _ = tile_xy(addr, tile_id_width)
+    return min(x // columns_per_channel(width, num_channels),
+               num_channels - 1)
+
+
+def partition_bitstream(bitstream: Iterable[Tuple[int, int]], width: int,
+                        num_channels: int, tile_id_width: int = 16):
+    """
+    Returns one list of writes per config channel. The relative order of the
+    writes within a channel is preserved.
+    """
+    result = [[] for _ in range(num_channels)]
+    for addr, data in bitstream:
+        channel = config_channel(addr, width, num_channels, tile_id_width)
+        result[channel].append((addr, data))
+    return result
+
+
+def channel_summary(partitions: List[List[Tuple[int, int]]]):
+    """
+    Reports the per-channel write counts. The channel assignment is fixed by
+    the wiring, so an unbalanced load can only be improved by placement;
+    speedup is the serial write count over the longest channel.
+    """
+    counts = [len(partition) for partition in partitions]
+    total = sum(counts)
+    longest = max(counts) if counts else 0
+    mean = total / len(counts) if counts else 0
+    return {"counts": counts,
+            "total": total,
+            "max": longest,
+            "imbalance": longest / mean if mean else 1.0,
+            "speedup": total / longest if longest else 1.0}
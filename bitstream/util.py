@@ -0,0 +1,38 @@
+"""Helpers to decode configuration addresses
+
+A configuration address is laid out as
+    [reg addr | feature addr | tile id]
+where the tile id is (x << tile_id_width / 2) | y and the feature address
+takes the bits between the tile id and the register address.
+"""
+from collections import namedtuple
+
+
+ConfigAddr = namedtuple("ConfigAddr", ["reg", "feature", "x", "y"])
+
+
+def tile_id(addr: int, tile_id_width: int = 16):
+    return addr & ((1 << tile_id_width) - 1)
+
+
+def tile_xy(addr: int, tile_id_width: int = 16):
+    half = tile_id_width // 2
+    tile = tile_id(addr, tile_id_width)
+    return tile >> half, tile & ((1 << half) - 1)
+
+
+def decode_addr(addr: int, config_addr_width: int = 32,
+                config_addr_reg_width: int = 8, tile_id_width: int = 16):
+    feature_width = config_addr_width - config_addr_reg_width - tile_id_width
+    x, y = tile_xy(addr, tile_id_width)
+    feature = (addr >> tile_id_width) & ((1 << feature_width) - 1)
+    reg = addr >> (config_addr_width - config_addr_reg_width)
+    return ConfigAddr(reg, feature, x, y)
+
+
+def encode_addr(reg: int, feature: int, x: int, y: int,
+                config_addr_width: int = 32, config_addr_reg_width: int = 8,
+                tile_id_width: int = 16):
+    reg_shift = config_addr_width - config_addr_reg_width
+    return (reg << reg_shift) | (feature << tile_id_width) | \
+        (x << (tile_id_width // 2)) | y
@@ -0,0 +1,99 @@
+"""Compile many CoreIR apps across a pool of pre-built Garnet workers"""
+import glob
+import multiprocessing
+import os
+import traceback
+from bitstream import write_bitstream
+from .instrument import Profiler
+
+
+# each worker process builds its own Garnet and mapper exactly once
+_garnet = None
+# the traceback of a worker that failed to build them. the pool would
+# restart a worker whose initializer raises forever, so the error is
+# reported for every app instead
+_init_error = None
+# apps are loaded into the mapper's coreir context, where the top module of
+# one app would collide with the next one's
+_context_used = False
+
+
+def find_apps(path: str):
+    """
+    Returns the apps in @path, which is either a directory of CoreIR json
+    files or a manifest with one app per line, optionally followed by the
+    output bitstream filename. Relative paths in a manifest are resolved
+    against the manifest's directory.
+    """
+    if os.path.isdir(path):
+        return [(app, "") for app in
+                sorted(glob.glob(os.path.join(path, "*.json")))]
+    root = os.path.dirname(path)
+    result = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            tokens = line.split()
+            app = os.path.join(root, tokens[0])
+            output = os.path.join(root, tokens[1]) if len(tokens) > 1 else ""
+            result.append((app, output))
+    return result
+
+
+def _init_worker(garnet_factory, rewrite_rules):
+    global _garnet, _init_error
+    try:
+        _garnet = garnet_factory()
+        if rewrite_rules:
+            _garnet.set_rewrite_rules(rewrite_rules)
+        _garnet.initialize_mapper(_garnet.rewrite_rules)
+    except Exception:
+        _init_error = traceback.format_exc()
+
+
+def _compile_app(job):
+    global _context_used
+    app, output, bitstream_format, compact = job
+    profiler = Profiler()
+    if _init_error is not None:
+        return app, output, _init_error, profiler.stage_times()
+    try:
+        if _context_used:
+            with profiler.span("reset_mapper"):
+                _garnet.reset_mapper(profiler=profiler)
+        _context_used = True
+        bitstream = _garnet.compile(app, profiler=profiler, compact=compact)
+        write_bitstream(output, bitstream, bitstream_format, _garnet.width,
+                        _garnet.height, _garnet.interconnect.tile_id_width)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return app, output, error, profiler.stage_times()
+
+
+def compile_batch(garnet_factory, apps, output_dir: str, num_workers=None,
+                  rewrite_rules: str = "", bitstream_format: str = "text",
+                  compact: bool = False):
+    """
+    Compiles @apps, a list of (app, output) pairs, with @num_workers processes
+    (defaults to the number of CPUs). Apps without an output filename are
+    written to @output_dir. Yields (app, output, error, timings) as soon as
+    each app finishes; error is None on success.
+    """
+    jobs = []
+    for app, output in apps:
+        if not output:
+            name = os.path.splitext(os.path.basename(app))[0]
+            output = os.path.join(output_dir, name + ".bit")
+        jobs.append((app, output, bitstream_format, compact))
+        # manifests may place outputs in directories of their own
+        output_parent = os.path.dirname(output)
+        if output_parent:
+            os.makedirs(output_parent, exist_ok=True)
+    with multiprocessing.Pool(num_workers, initializer=_init_worker,
+                              initargs=(garnet_factory,
+                                        rewrite_rules)) as pool:
+        for result in pool.imap_unordered(_compile_app, jobs):
+            yield result
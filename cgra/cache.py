@@ -0,0 +1,364 @@
+"""Content-addressed on-disk cache of the elaborated Garnet interconnect"""
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+import pkg_resources
+from bitstream import encode_addr
+
+
+GARNET_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# anything that changes the elaborated design has to change the key
+_SOURCE_PATTERNS = ("garnet.py", "*/*.py", "*/genesis/*.svp",
+                    "*/genesis/*.vp", "*/genesis/*.sv", "peak_core/*.v")
+_LIBRARIES = ("magma-lang", "coreir", "mantle", "hwtypes", "gemstone",
+              "canal", "peak", "lassen", "archipelago")
+
+_CACHE_VERSION = 1
+_MANIFEST = "manifest.json"
+_PNR_NAME = "garnet"
+
+CachedTag = namedtuple("CachedTag", ["tag_name"])
+
+
+def default_cache_dir():
+    return os.getenv("GARNET_CACHE_DIR",
+                     os.path.join(os.path.expanduser("~"), ".cache",
+                                  "garnet"))
+
+
+def library_versions(names=_LIBRARIES):
+    result = {}
+    for name in names:
+        try:
+            result[name] = pkg_resources.get_distribution(name).version
+        except pkg_resources.DistributionNotFound:
+            result[name] = None
+    return result
+
+
+def source_digest(root: str = GARNET_ROOT, patterns=_SOURCE_PATTERNS):
+    digest = hashlib.sha256()
+    filenames = set()
+    for pattern in patterns:
+        filenames |= set(glob.glob(os.path.join(root, pattern),
+                                   recursive=True))
+    for filename in sorted(filenames):
+        digest.update(os.path.relpath(filename, root).encode())
+        with open(filename, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def fingerprint(**params):
+    """Returns the cache key of a design elaborated with @params"""
+    content = {"params": {name: str(value) for name, value in params.items()},
+               "sources": source_digest(),
+               "libraries": library_versions(),
+               "version": _CACHE_VERSION}
+    content = json.dumps(content, sort_keys=True).encode()
+    return hashlib.sha256(content).hexdigest()
+
+
+def node_key(node):
+    # same normalization archipelago applies to the router output, so that
+    # parse_node() results can be used to index the route table directly
+    tokens = "".join([c for c in str(node) if c not in ",()"]).split()
+    return tuple(int(t) if t.isdigit() else t for t in tokens)
+
+
+def _muxed_nodes(tile):
+    nodes = [cb.node for cb in tile.cbs.values()]
+    for sb in tile.sbs.values():
+        nodes += [node for node, _ in sb.sb_muxs.values()]
+        nodes += [node for node, _ in sb.reg_muxs.values()]
+    return nodes
+
+
+def dump_pnr_once(interconnect, dir_name: str, design_name: str, key: str):
+    """
+    Dumps the PnR graphs of @interconnect to @dir_name unless it already
+    holds a dump of the design with the same @key. Returns the info file.
+    """
+    info_file = os.path.join(dir_name, design_name + ".info")
+    key_file = os.path.join(dir_name, design_name + ".key")
+    if os.path.isfile(info_file) and os.path.isfile(key_file):
+        with open(key_file) as f:
+            if f.read() == key:
+                return info_file
+    # the key file is the commit point of a dump: it is removed before the
+    # graphs are overwritten and written last, so that an interrupted dump
+    # is never mistaken for the previous design
+    if os.path.isfile(key_file):
+        os.remove(key_file)
+    if not os.path.isdir(dir_name):
+        os.makedirs(dir_name)
+    interconnect.dump_pnr(dir_name, design_name)
+    temp_file = key_file + ".tmp"
+    with open(temp_file, "w+") as f:
+        f.write(key)
+    os.replace(temp_file, key_file)
+    return info_file
+
+
+def core_feature_index(tile):
+    # the first feature of a core holds its configuration registers. for the
+    # PE that is the core itself, memory cores add one feature per SRAM
+    if isinstance(tile, _CachedTile):
+        return tile.feature_index
+    return tile.features().index(tile.core.features()[0])
+
+
+def _dump_route_table(interconnect):
+    # only edges going into a mux produce configuration writes; everything
+    # else is hard-wired and is skipped by get_route_bitstream() as well
+    result = []
+    for tile in interconnect.tile_circuits.values():
+        for node in _muxed_nodes(tile):
+            conn_in = node.get_conn_in()
+            if len(conn_in) < 2:
+                continue
+            for src in conn_in:
+                config = interconnect.get_route_bitstream({"e0": [[src,
+                                                                   node]]})
+                result.append([node_key(src), node_key(node), config])
+    return result
+
+
+def _dump_tiles(interconnect):
+    tiles = []
+    cores = {}
+    for (x, y), tile in interconnect.tile_circuits.items():
+        core = tile.core
+        if core is None:
+            continue
+        name = core.name()
+        tiles.append([x, y, name, core_feature_index(tile)])
+        if name in cores:
+            continue
+        tags = core.pnr_info()
+        if not isinstance(tags, list):
+            tags = [tags]
+        registers = getattr(core, "registers", {})
+        cores[name] = {"tags": [tag.tag_name for tag in tags],
+                       "registers": {reg_name: reg.addr for reg_name, reg in
+                                     registers.items()}}
+    return tiles, cores
+
+
+class _CachedCore:
+    def __init__(self, name, tags, registers):
+        self.__name = name
+        self.__tags = [CachedTag(tag) for tag in tags]
+        self.registers = registers
+
+    def pnr_info(self):
+        return self.__tags
+
+    def name(self):
+        return self.__name
+
+
+class _CachedTile:
+    def __init__(self, core, feature_index):
+        self.core = core
+        self.feature_index = feature_index
+
+
+class CachedInterconnect:
+    """
+    Stands in for the canal interconnect of a cached design. It implements the
+    subset of the interconnect interface used by the compile flow
+    (archipelago's dump_pnr()/parse_node(), get_route_bitstream() and
+    configure_placement()) from the cached graph dump and address map.
+    """
+    def __init__(self, entry_dir, manifest, peak_generator):
+        self.__entry_dir = entry_dir
+        self.__peak_generator = peak_generator
+        self.__peak_wrapper = None
+        geometry = manifest["geometry"]
+        self.config_addr_width = geometry["config_addr_width"]
+        self.config_addr_reg_width = geometry["config_addr_reg_width"]
+        self.tile_id_width = geometry["tile_id_width"]
+        cores = {name: _CachedCore(name, entry["tags"], entry["registers"])
+                 for name, entry in manifest["cores"].items()}
+        self.tile_circuits = {(x, y): _CachedTile(cores[name], feature_index)
+                              for x, y, name, feature_index in
+                              manifest["tiles"]}
+        self.__routes = {}
+        for src, dst, config in manifest["routes"]:
+            self.__routes[(tuple(src), tuple(dst))] = \
+                [tuple(entry) for entry in config]
+
+    def dump_pnr(self, dir_name, design_name):
+        # re-point the cached info file to the cached layout and graphs
+        if not os.path.isdir(dir_name):
+            os.makedirs(dir_name)
+        src_info = os.path.join(self.__entry_dir, "pnr", _PNR_NAME + ".info")
+        lines = []
+        with open(src_info) as f:
+            for line in f:
+                if "=" not in line:
+                    lines.append(line.rstrip("\n"))
+                    continue
+                key, value = line.split("=", 1)
+                tokens = [self.__cached_path(token) for token in
+                          value.split()]
+                lines.append(key + "=" + " ".join(tokens))
+        with open(os.path.join(dir_name, design_name + ".info"), "w+") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def __cached_path(self, token):
+        if token.isdigit():
+            return token
+        return os.path.join(self.__entry_dir, "pnr", os.path.basename(token))
+
+    def parse_node(self, node_str):
+        return tuple(node_str)
+
+    def get_route_bitstream(self, routes):
+        result = []
+        for _, route in routes.items():
+            for segment in route:
+                for i in range(len(segment) - 1):
+                    edge = (segment[i], segment[i + 1])
+                    result += self.__routes.get(edge, [])
+        return result
+
+    def get_config_addr(self, reg_addr, feat_addr, x, y):
+        return encode_addr(reg_addr, feat_addr, x, y, self.config_addr_width,
+                           self.config_addr_reg_width, self.tile_id_width)
+
+    def configure_placement(self, x, y, instr):
+        tile = self.tile_circuits[(x, y)]
+        core = tile.core
+        if core.name() == "io_core":
+            # IO cores have no configuration
+            return []
+        if core.name() == "MemCore":
+            from memory_core.memory_core_magma import mem_config_bitstream
+            return [(self.get_config_addr(reg_addr, tile.feature_index, x,
+                                          y), data)
+                    for reg_addr, data in mem_config_bitstream(instr)]
+        if core.name() != "PE":
+            raise NotImplementedError(core.name())
+        if self.__peak_wrapper is None:
+            # only the PE assembler is built, not the array
+            from peak_core.peak_core import _PeakWrapper
+            self.__peak_wrapper = _PeakWrapper(self.__peak_generator)
+        instr_name = self.__peak_wrapper.instruction_name()
+        result = []
+        for i, data in enumerate(self.__peak_wrapper.config_words(instr)):
+            reg_addr = core.registers[f"{instr_name}_{i}"]
+            result.append((self.get_config_addr(reg_addr, tile.feature_index,
+                                                x, y), data))
+        return result
+
+
+class ElaborationCache:
+    def __init__(self, cache_dir: str):
+        self.cache_dir = os.path.abspath(cache_dir)
+
+    def entry_dir(self, key: str):
+        return os.path.join(self.cache_dir, key)
+
+    def __contains__(self, key: str):
+        return os.path.isfile(os.path.join(self.entry_dir(key), _MANIFEST))
+
+    def store(self, key: str, interconnect, geometry):
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        # build the entry aside and move it in place so that concurrent runs
+        # never observe a partially written entry
+        temp_dir = tempfile.mkdtemp(dir=self.cache_dir)
+        interconnect.dump_pnr(os.path.join(temp_dir, "pnr"), _PNR_NAME)
+        tiles, cores = _dump_tiles(interconnect)
+        manifest = {
+            "geometry": geometry,
+            "tiles": tiles,
+            "cores": cores,
+            "routes": _dump_route_table(interconnect)}
+        with open(os.path.join(temp_dir, _MANIFEST), "w+") as f:
+            json.dump(manifest, f)
+        try:
+            os.rename(temp_dir, self.entry_dir(key))
+        except OSError:
+            # someone else stored the same entry first
+            shutil.rmtree(temp_dir)
+
+    def load(self, key: str, peak_generator):
+        entry_dir = self.entry_dir(key)
+        with open(os.path.join(entry_dir, _MANIFEST)) as f:
+            manifest = json.load(f)
+        return CachedInterconnect(entry_dir, manifest, peak_generator)
+
+
+_PNR_LIBRARIES = ("archipelago", "pycyclone", "pythunder")
+
+
+def _node_tokens(node):
+    # nodes of a cached design already are token tuples
+    return list(node if isinstance(node, tuple) else node_key(node))
+
+
+def dump_routing(routing):
+    # routing nodes are stored in the router's token form, which
+    # parse_node() turns back into nodes of any interconnect
+    return {net_id: [[_node_tokens(node) for node in segment]
+                     for segment in route]
+            for net_id, route in routing.items()}
+
+
+class PnRCache:
+    """
+    Stores placement and routing results as json, keyed by the netlist and
+    the fingerprint of the interconnect it was placed on.
+    """
+    def __init__(self, cache_dir: str):
+        self.cache_dir = os.path.join(os.path.abspath(cache_dir), "pnr")
+
+    @staticmethod
+    def key(netlist, bus, interconnect_fingerprint: str, seeds: int = 1,
+            backend: str = "archipelago"):
+        # the netlist is canonicalized by json (tuples become lists, nets
+        # are sorted by id)
+        content = {"netlist": netlist,
+                   "bus": bus,
+                   "interconnect": interconnect_fingerprint,
+                   "seeds": seeds,
+                   "backend": backend,
+                   "libraries": library_versions(_PNR_LIBRARIES)}
+        content = json.dumps(content, sort_keys=True).encode()
+        return hashlib.sha256(content).hexdigest()
+
+    def filename(self, key: str):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def load(self, key: str, interconnect):
+        """Returns (seed, placement, routing, id_to_name), or None"""
+        filename = self.filename(key)
+        if not os.path.isfile(filename):
+            return None
+        with open(filename) as f:
+            entry = json.load(f)
+        placement = {blk_id: tuple(pos) for blk_id, pos in
+                     entry["placement"].items()}
+        routing = {net_id: [[interconnect.parse_node(node)
+                             for node in segment] for segment in route]
+                   for net_id, route in entry["routing"].items()}
+        return entry["seed"], placement, routing, entry["id_to_name"]
+
+    def store(self, key: str, seed: int, placement, routing, id_to_name):
+        # @routing is in the dump_routing() form
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        entry = {"seed": seed, "placement": placement, "routing": routing,
+                 "id_to_name": id_to_name}
+        fd, temp_filename = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(temp_filename, self.filename(key))
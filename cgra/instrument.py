@@ -0,0 +1,108 @@
+"""Lightweight span-based instrumentation of the Garnet flow"""
+import contextlib
+import json
+import os
+import resource
+import time
+
+
+def _max_rss_kb(who):
+    # the high-water mark over the lifetime of the process (or of all its
+    # finished children). ru_maxrss is in kilobytes on linux but in bytes on
+    # macOS
+    rss = resource.getrusage(who).ru_maxrss
+    if os.uname().sysname == "Darwin":
+        rss //= 1024
+    return rss
+
+
+def _children_cpu():
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+class Profiler:
+    """
+    Records nested spans with wall time, CPU time (of this process and of
+    finished child processes, e.g. the PnR tools) and memory use. The OS
+    only reports the peak RSS over the lifetime of a process, so a span
+    records that lifetime peak at its end (process_max_rss_kb) and how much
+    the span raised it (max_rss_growth_kb). A span that stays below an
+    earlier peak shows no growth. A disabled profiler records nothing.
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.spans = []
+        self.__stack = []
+        self.__origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args):
+        if not self.enabled:
+            yield
+            return
+        entry = {"name": name,
+                 "parent": self.__stack[-1]["name"] if self.__stack else None,
+                 "depth": len(self.__stack),
+                 "args": args}
+        self.__stack.append(entry)
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        start_children_cpu = _children_cpu()
+        start_max_rss = _max_rss_kb(resource.RUSAGE_SELF)
+        start_children_max_rss = _max_rss_kb(resource.RUSAGE_CHILDREN)
+        try:
+            yield
+        finally:
+            self.__stack.pop()
+            entry["start"] = start_wall - self.__origin
+            entry["wall"] = time.perf_counter() - start_wall
+            entry["cpu"] = time.process_time() - start_cpu
+            entry["children_cpu"] = _children_cpu() - start_children_cpu
+            max_rss = _max_rss_kb(resource.RUSAGE_SELF)
+            children_max_rss = _max_rss_kb(resource.RUSAGE_CHILDREN)
+            entry["process_max_rss_kb"] = max_rss
+            entry["max_rss_growth_kb"] = max_rss - start_max_rss
+            entry["children_max_rss_kb"] = children_max_rss
+            entry["children_max_rss_growth_kb"] = \
+                children_max_rss - start_children_max_rss
+            self.spans.append(entry)
+
+    def stage_times(self):
+        # spans with the same name, e.g. from a loop, are accumulated
+        result = {}
+        for entry in self.spans:
+            result[entry["name"]] = result.get(entry["name"], 0) + \
+                entry["wall"]
+        return result
+
+    def to_json(self):
+        return {"spans": sorted(self.spans, key=lambda e: e["start"])}
+
+    def to_chrome_trace(self):
+        pid = os.getpid()
+        events = []
+        for entry in self.spans:
+            args = dict(entry["args"])
+            for key in ("cpu", "children_cpu", "process_max_rss_kb",
+                        "max_rss_growth_kb", "children_max_rss_kb",
+                        "children_max_rss_growth_kb"):
+                args[key] = entry[key]
+            events.append({"name": entry["name"], "ph": "X", "pid": pid,
+                           "tid": 0, "ts": entry["start"] * 1e6,
+                           "dur": entry["wall"] * 1e6, "args": args})
+        events.sort(key=lambda e: e["ts"])
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, filename: str, fmt: str = "chrome"):
+        if fmt == "chrome":
+            content = self.to_chrome_trace()
+        elif fmt == "json":
+            content = self.to_json()
+        else:
+            raise ValueError(f"Unknown profile format {fmt}")
+        with open(filename, "w+") as f:
+            json.dump(content, f, indent=2)
+
+
+NULL_PROFILER = Profiler(enabled=False)
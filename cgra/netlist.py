@@ -0,0 +1,70 @@
+"""Single pass conversion of a mapped CoreIR app into an archipelago netlist"""
+import sys
+
+
+def build_netlist(mapped, core_tag, core_port=None):
+    """
+    Builds the (netlist, bus, id_to_name) triple archipelago consumes from
+    the top definition of @mapped. @core_tag(module_name) returns the PnR tag
+    of a module and @core_port(tag, port), if given, renames instance ports
+    to the ports of the core they are placed on.
+
+    Instances are numbered and tagged as they are first seen, so no
+    intermediate copy of the instance list is kept. Port names are interned
+    and bus widths are looked up once per (module, port).
+
+    Raises ValueError if two nets drive the same core port, e.g. a memory
+    whose read and write addresses both map to its single address port.
+    """
+    top_def = mapped.definition
+    # instance name -> (id, instance, module name)
+    instances = {}
+    id_to_name = {}
+    for instance in top_def.instances:
+        module_name = instance.module.name
+        instance_id = core_tag(module_name) + str(len(instances))
+        instance_name = instance.name
+        assert instance_name not in instances
+        instances[instance_name] = instance_id, instance, module_name
+        id_to_name[instance_id] = instance_name
+
+    port_ids = {}
+    widths = {}
+    src_to_net_id = {}
+    netlist = {}
+    bus = {}
+    # (instance id, core port) -> instance port driving it
+    sinks = {}
+
+    def endpoint(instance_id, port):
+        key = instance_id[0], port
+        if key not in port_ids:
+            name = port if core_port is None else core_port(*key)
+            port_ids[key] = sys.intern(name)
+        return instance_id, port_ids[key]
+
+    for conn in mapped.directed_module.connections:
+        assert len(conn.source) == 2
+        assert len(conn.sink) == 2
+        src_name, src_port = conn.source
+        dst_name, dst_port = conn.sink
+        src_id, src_instance, src_module = instances[src_name]
+        dst_id = instances[dst_name][0]
+        src_key = src_name, src_port
+        net_id = src_to_net_id.get(src_key, None)
+        if net_id is None:
+            net_id = "e" + str(len(netlist))
+            src_to_net_id[src_key] = net_id
+            netlist[net_id] = [endpoint(src_id, src_port)]
+            width_key = src_module, src_port
+            if width_key not in widths:
+                widths[width_key] = src_instance.select(src_port).type.size
+            bus[net_id] = widths[width_key]
+        sink = endpoint(dst_id, dst_port)
+        if sink in sinks:
+            raise ValueError(f"{dst_name}.{sinks[sink]} and "
+                             f"{dst_name}.{dst_port} both drive {sink[1]} of "
+                             f"the core {dst_name} is placed on")
+        sinks[sink] = dst_port
+        netlist[net_id].append(sink)
+    return netlist, bus, id_to_name
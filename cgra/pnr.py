@@ -0,0 +1,252 @@
+"""Place and route backends, and multi-seed PnR keeping the best result"""
+import importlib.util
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+
+class PnRBackend:
+    """
+    Places and routes a netlist on an interconnect. Returns (placement,
+    routing, id_to_name); backends that pack the app themselves return
+    their own block ids. @info_file, if given, is an existing dump of the
+    interconnect's PnR graphs that is used instead of dumping it again.
+    Backends that place the netlist they are given support multiple seeds.
+    Backends that pack the app themselves read the mapped app from
+    @app_file instead.
+    """
+    name = ""
+    supports_seeds = True
+    needs_mapped_app = False
+
+    def place_and_route(self, interconnect, netlist, bus, id_to_name,
+                        app_file="", info_file=""):
+        raise NotImplementedError()
+
+
+class ArchipelagoBackend(PnRBackend):
+    """
+    Runs archipelago in process on the interconnect and netlist objects. It
+    still dumps the routing graph for its placer and router binaries.
+    """
+    name = "archipelago"
+
+    def place_and_route(self, interconnect, netlist, bus, id_to_name,
+                        app_file="", info_file=""):
+        import archipelago
+        if not info_file:
+            placement, routing = archipelago.pnr(interconnect, (netlist, bus))
+            return placement, routing, id_to_name
+        # given a graph dump archipelago returns the raw router output
+        from archipelago.util import parse_routing_result
+        placement, routing = archipelago.pnr(info_file, (netlist, bus))
+        return placement, parse_routing_result(routing, interconnect), \
+            id_to_name
+
+
+def _load_id_to_name(packed_filename):
+    result = {}
+    with open(packed_filename) as f:
+        lines = iter(f)
+        for line in lines:
+            if line.strip() == "ID to Names:":
+                break
+        for line in lines:
+            line = line.strip()
+            if not line:
+                break
+            blk_id, name = line.split(":", 1)
+            result[blk_id.strip()] = name.strip()
+    return result
+
+
+class ShellBackend(PnRBackend):
+    """
+    Runs the CGRA_PnR flow script on a dump of the interconnect and the
+    mapped CoreIR app, and loads the results it writes next to the app.
+    The script packs the app itself, so the netlist is not used and seeds
+    make no difference.
+    """
+    name = "shell"
+    supports_seeds = False
+    needs_mapped_app = True
+
+    def __init__(self, cgra_path=""):
+        self.cgra_path = cgra_path or os.getenv("CGRA_PNR", "")
+
+    def place_and_route(self, interconnect, netlist, bus, id_to_name,
+                        app_file="", info_file=""):
+        assert self.cgra_path != "", "Cannot find CGRA PnR"
+        assert app_file, "the shell backend needs the mapped app"
+        entry_point = os.path.join(self.cgra_path, "scripts", "pnr_flow.sh")
+        if info_file:
+            subprocess.check_call([entry_point, info_file, app_file])
+        else:
+            with tempfile.TemporaryDirectory() as cwd:
+                interconnect.dump_pnr(cwd, "design")
+                info_file = os.path.join(cwd, "design.info")
+                subprocess.check_call([entry_point, info_file, app_file])
+        return self.load_results(os.path.splitext(app_file)[0], interconnect)
+
+    def load_results(self, base, interconnect):
+        from archipelago.io import load_routing_result
+        from archipelago.util import parse_routing_result
+        import pycyclone
+        placement = pycyclone.io.load_placement(base + ".place")
+        routing = parse_routing_result(load_routing_result(base + ".route"),
+                                       interconnect)
+        return placement, routing, _load_id_to_name(base + ".packed")
+
+
+PNR_BACKENDS = {backend.name: backend for backend in
+                (ArchipelagoBackend, ShellBackend)}
+
+
+def default_backend():
+    # archipelago when it is installed, the CGRA_PnR scripts otherwise
+    if importlib.util.find_spec("archipelago") is not None:
+        return ArchipelagoBackend()
+    return ShellBackend()
+
+
+# set by pnr_multi_seed() right before forking the pool. the interconnect
+# cannot be pickled, so workers inherit it instead
+_job = None
+
+
+def permute_netlist(netlist, bus, id_to_name, seed: int):
+    """
+    Renumbers the blocks and nets of a netlist. The placer and router are
+    deterministic, so the numbering is what a seed changes: it determines
+    the initial placement and the order nets are routed in. Seed 0 returns
+    the netlist unchanged.
+    """
+    if seed == 0:
+        return netlist, bus, id_to_name
+    rng = random.Random(seed)
+    numbers = list(range(len(id_to_name)))
+    rng.shuffle(numbers)
+    rename = {blk_id: blk_id[0] + str(number) for blk_id, number in
+              zip(id_to_name, numbers)}
+    net_ids = list(netlist)
+    rng.shuffle(net_ids)
+    new_netlist = {}
+    new_bus = {}
+    for index, net_id in enumerate(net_ids):
+        new_net_id = "e" + str(index)
+        new_netlist[new_net_id] = [(rename[blk_id], port) for blk_id, port in
+                                   netlist[net_id]]
+        new_bus[new_net_id] = bus[net_id]
+    new_id_to_name = {rename[blk_id]: name for blk_id, name in
+                      id_to_name.items()}
+    return new_netlist, new_bus, new_id_to_name
+
+
+def _is_register(node):
+    # routing nodes are canal nodes, or token tuples on cached designs
+    if isinstance(node, tuple):
+        node = node[0]
+    return str(node).startswith("REG")
+
+
+def routing_stats(routing):
+    """
+    Returns the quality of a routing result: the longest run of routing
+    nodes without a pipeline register (critical_path), the total number of
+    routing nodes used (wire_length) and the number of registers.
+    """
+    critical_path = 0
+    wire_length = 0
+    registers = 0
+    for route in routing.values():
+        for segment in route:
+            wire_length += len(segment)
+            run = 0
+            for node in segment:
+                if _is_register(node):
+                    registers += 1
+                    run = 0
+                else:
+                    run += 1
+                    critical_path = max(critical_path, run)
+    return {"critical_path": critical_path, "wire_length": wire_length,
+            "registers": registers}
+
+
+def score(stats):
+    # lower is better, compared in order
+    return stats["critical_path"], stats["wire_length"], stats["registers"]
+
+
+def _run_seed(seed):
+    backend, interconnect, netlist, bus, id_to_name, app_file, info_file, \
+        finish = _job
+    start = time.perf_counter()
+    try:
+        netlist, bus, id_to_name = permute_netlist(netlist, bus, id_to_name,
+                                                   seed)
+        placement, routing, id_to_name = backend.place_and_route(
+            interconnect, netlist, bus, id_to_name, app_file, info_file)
+        stats = routing_stats(routing)
+        result = finish(placement, routing, id_to_name)
+        error = None
+    except Exception:
+        stats = None
+        result = None
+        error = traceback.format_exc()
+    return seed, stats, result, error, time.perf_counter() - start
+
+
+def pnr_multi_seed(backend, interconnect, netlist, bus, id_to_name, seeds,
+                   finish, num_workers=None, info_file="", app_file=""):
+    """
+    Places and routes the netlist with @backend once per seed in @seeds
+    across @num_workers processes. @finish(placement, routing, id_to_name) is
+    called in the worker on each successful result and must return
+    something picklable, e.g. the bitstream. Returns (best, attempts), where
+    best is the (seed, stats, result) with the lowest score() and attempts
+    lists (seed, stats, error, seconds) for every seed.
+    """
+    global _job
+    seeds = list(seeds)
+    if len(seeds) > 1 and not backend.supports_seeds:
+        raise ValueError(f"the {backend.name} backend does not support "
+                         f"multiple PnR seeds")
+    _job = backend, interconnect, netlist, bus, id_to_name, app_file, \
+        info_file, finish
+    attempts = []
+    best = None
+    try:
+        with multiprocessing.get_context("fork").Pool(num_workers) as pool:
+            for seed, stats, result, error, seconds in \
+                    pool.imap_unordered(_run_seed, seeds):
+                attempts.append((seed, stats, error, seconds))
+                if stats is None:
+                    continue
+                if best is None or (score(stats), seed) < \
+                        (score(best[1]), best[0]):
+                    best = seed, stats, result
+    finally:
+        _job = None
+    attempts.sort(key=lambda attempt: attempt[0])
+    if best is None:
+        errors = "\n".join(f"seed {seed}: {error}" for seed, _, error, _ in
+                           attempts)
+        raise RuntimeError(f"PnR failed for every seed\n{errors}")
+    return best, attempts
+
+
+def print_attempts(attempts, best_seed, file=sys.stderr):
+    for seed, stats, error, seconds in attempts:
+        marker = "*" if seed == best_seed else " "
+        if stats is None:
+            summary = "failed: " + error.strip().splitlines()[-1]
+        else:
+            summary = " ".join(f"{key}={value}" for key, value in
+                               stats.items())
+        print(f"{marker} seed {seed}: {summary} ({seconds:.1f}s)", file=file)
@@ -0,0 +1,157 @@
+"""Cache of rewrite rules discovered for the PE"""
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import coreir
+from lassen import LassenMapper
+from peak_core.peak_core import _PeakWrapper
+from .cache import library_versions, source_digest
+
+
+_LIBRARIES = ("lassen", "peak", "metamapper", "hwtypes", "coreir")
+
+
+def bypass_mode(inst):
+    # Hack to speed up rewrite rules discovery.
+    return inst.rega == type(inst.rega).BYPASS and \
+        inst.regb == type(inst.regb).BYPASS and \
+        inst.regd == type(inst.regd).BYPASS and \
+        inst.rege == type(inst.rege).BYPASS and \
+        inst.regf == type(inst.regf).BYPASS
+
+
+class ALUConstraint:
+    """
+    Restricts discovery to instructions using a single ALU opcode. It is a
+    class rather than a closure so that it can be sent to worker processes.
+    """
+    def __init__(self, opcode: str):
+        self.opcode = opcode
+
+    def __call__(self, inst):
+        return inst.alu == getattr(type(inst.alu), self.opcode)
+
+    def __repr__(self):
+        return f"alu={self.opcode}"
+
+
+def alu_partitions(peak_generator):
+    # partition the instruction space by ALU opcode. the opcodes are read
+    # from the PE's instruction type so that ISA changes are picked up
+    instr_type = _PeakWrapper(peak_generator).instruction_type()
+    alu_type = instr_type.field_dict["alu"]
+    return [ALUConstraint(opcode.name) for opcode in alu_type.enumerate()]
+
+
+def _discover_partition(args):
+    constraints, width = args
+    start = time.perf_counter()
+    mapper = LassenMapper(coreir.Context())
+    for constraint in constraints:
+        mapper.add_discover_constraint(constraint)
+    rules = mapper.discover_peak_rewrite_rules(width=width, serialize=True)
+    return constraints[-1], rules, time.perf_counter() - start
+
+
+def _rule_name(rule):
+    # rules are identified by the primitive they rewrite. descriptions
+    # without a name fall back to their content
+    if "name" in rule:
+        return rule["name"]
+    return json.dumps(rule, sort_keys=True)
+
+
+def discover_rules_parallel(partitions, constraints, width: int,
+                            num_workers=None, progress=None):
+    """
+    Runs rule discovery for every partition (an extra constraint on top of
+    @constraints) across @num_workers processes and merges the results.
+    @progress, if given, is called with (done, total, partition, num_rules,
+    seconds) as partitions finish.
+
+    Partitions may overlap and find different rules for the same primitive.
+    Only one rule is kept per primitive: the first one found in the first
+    partition that finds it, so the result does not depend on the order the
+    workers finish in.
+    """
+    jobs = [(list(constraints) + [partition], width)
+            for partition in partitions]
+    partition_rules = [None] * len(jobs)
+    with multiprocessing.Pool(num_workers) as pool:
+        results = pool.imap_unordered(_discover_indexed, enumerate(jobs))
+        for done, (index, (partition, rules, seconds)) in \
+                enumerate(results):
+            partition_rules[index] = rules
+            if progress is not None:
+                progress(done + 1, len(jobs), partition, len(rules), seconds)
+    result = {}
+    for rules in partition_rules:
+        for rule in rules:
+            result.setdefault(_rule_name(rule), rule)
+    return list(result.values())
+
+
+def _discover_indexed(args):
+    index, job = args
+    return index, _discover_partition(job)
+
+
+def print_progress(done, total, partition, num_rules, seconds):
+    print(f"[{done}/{total}] {partition}: {num_rules} rules in "
+          f"{seconds:.1f}s", file=sys.stderr)
+
+
+def _package_digest(obj):
+    # hashes every python source of the package @obj is defined in, so that
+    # editable installs are invalidated without a version bump
+    package = inspect.getmodule(obj).__name__.split(".")[0]
+    root = os.path.dirname(sys.modules[package].__file__)
+    return source_digest(root, ("**/*.py",))
+
+
+def rules_fingerprint(peak_generator, constraints, width: int):
+    """
+    Returns the cache key of the rules discovered for @peak_generator under
+    @constraints at @width. The key covers the source of the PE package and
+    of the constraints, and the versions of the mapping libraries.
+    """
+    content = {"pe": _package_digest(peak_generator),
+               "pe_name": peak_generator.__qualname__,
+               "constraints": [inspect.getsource(c) for c in constraints],
+               "width": width,
+               "libraries": library_versions(_LIBRARIES)}
+    content = json.dumps(content, sort_keys=True).encode()
+    return hashlib.sha256(content).hexdigest()
+
+
+class RewriteRuleCache:
+    """
+    Stores discovered rules as a json list of descriptions, i.e. the same
+    format add_rr_from_description() and --rewrite-rules consume.
+    """
+    def __init__(self, cache_dir: str):
+        self.cache_dir = os.path.join(os.path.abspath(cache_dir),
+                                      "rewrite_rules")
+
+    def filename(self, key: str):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def load(self, key: str):
+        filename = self.filename(key)
+        if not os.path.isfile(filename):
+            return None
+        with open(filename) as f:
+            return json.load(f)
+
+    def store(self, key: str, rules):
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        fd, temp_filename = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, "w") as f:
+            json.dump(rules, f)
+        os.replace(temp_filename, self.filename(key))
@@ -0,0 +1,102 @@
+"""Long-lived compile server that keeps a Garnet instance and its mapper warm
+
+The protocol is line-delimited JSON. Each request is an object with an "op"
+field and an optional "id" that is echoed back in the response:
+
+    {"id": 0, "op": "compile", "app": "app.json", "compact": false}
+    -> {"id": 0, "bitstream": [[addr, data], ...], "timings": {...}}
+    {"id": 1, "op": "ping"}        -> {"id": 1, "result": "pong"}
+    {"id": 2, "op": "shutdown"}    -> {"id": 2, "result": "bye"}
+
+Failed requests get {"id": ..., "error": "..."} and the server keeps running.
+"""
+import json
+import os
+import socket
+import stat
+import sys
+import traceback
+from .instrument import Profiler
+
+
+class CompileServer:
+    def __init__(self, garnet):
+        self.garnet = garnet
+        if not garnet.mapper_initalized:
+            garnet.initialize_mapper(garnet.rewrite_rules)
+        # apps are loaded into the mapper's coreir context, where the top
+        # module of one app would collide with the next one's
+        self.context_used = False
+
+    def handle(self, request):
+        op = request.get("op", "")
+        if op == "compile":
+            profiler = Profiler()
+            if self.context_used:
+                with profiler.span("reset_mapper"):
+                    self.garnet.reset_mapper(profiler=profiler)
+            self.context_used = True
+            bitstream = self.garnet.compile(request["app"], profiler=profiler,
+                                            compact=request.get("compact",
+                                                                False))
+            return {"bitstream": [[addr, data] for addr, data in bitstream],
+                    "timings": profiler.stage_times()}
+        elif op == "ping":
+            return {"result": "pong"}
+        elif op == "shutdown":
+            return {"result": "bye"}
+        raise ValueError(f"Unknown op {op}")
+
+    def serve(self, rfile, wfile):
+        for line in rfile:
+            line = line.strip()
+            if not line:
+                continue
+            request = {}
+            try:
+                message = json.loads(line)
+                if not isinstance(message, dict):
+                    raise ValueError("a request must be a JSON object")
+                request = message
+                response = self.handle(request)
+            except Exception as ex:
+                traceback.print_exc(file=sys.stderr)
+                response = {"error": f"{type(ex).__name__}: {ex}"}
+            response["id"] = request.get("id", None)
+            wfile.write(json.dumps(response) + "\n")
+            wfile.flush()
+            if request.get("op", "") == "shutdown":
+                return False
+        return True
+
+    def serve_stdio(self):
+        # everything else (including PnR subprocesses) writes to fd 1, so move
+        # the protocol to a private copy of stdout and send the rest to stderr
+        sys.stdout.flush()
+        protocol_fd = os.dup(1)
+        os.dup2(2, 1)
+        with os.fdopen(protocol_fd, "w") as wfile:
+            self.serve(sys.stdin, wfile)
+
+    def serve_unix(self, path):
+        # a stale socket of a previous server is replaced, anything else is
+        # left alone
+        if os.path.exists(path):
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                raise FileExistsError(f"{path} exists and is not a socket")
+            os.remove(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(path)
+            sock.listen(1)
+            # the mapper and coreir context are not thread safe, so clients
+            # are served one at a time
+            running = True
+            while running:
+                conn, _ = sock.accept()
+                with conn, conn.makefile("r") as rfile, \
+                        conn.makefile("w") as wfile:
+                    running = self.serve(rfile, wfile)
+        finally:
+            sock.close()
+            os.remove(path)
@@ -15,23 +15,82 @@ from global_controller.axi4_type import AXI4SlaveType
 from canal.global_signal import GlobalSignalWiring
 from lassen.sim import gen_pe
 from cgra import create_cgra
+from memory_core.memory_core_magma import mem_config_bitstream
+from cgra.cache import ElaborationCache, fingerprint, default_cache_dir, \
+    core_feature_index, PnRCache, dump_routing, dump_pnr_once
+from cgra.rewrite_rules import RewriteRuleCache, rules_fingerprint, \
+    bypass_mode, alu_partitions, discover_rules_parallel, print_progress
+from cgra.server import CompileServer
+from cgra.netlist import build_netlist
+from cgra.pnr import pnr_multi_seed, print_attempts, default_backend, \
+    PNR_BACKENDS
+from cgra.batch import compile_batch, find_apps
+from cgra.instrument import Profiler, NULL_PROFILER
+from bitstream import write_bitstream, compact_bitstream, FORMATS, \
+    partition_bitstream, channel_summary, read_bitstream, diff_bitstream
+from global_controller.config_time import estimate_config_time, \
+    config_seconds
+from global_controller.jtag_vectors import write_jtag_vectors, \
+    FORMATS as JTAG_FORMATS
+import contextlib
+import functools
+import tempfile
+import sys
 import metamapper
-import subprocess
 import os
 import math
-import archipelago
 import json
 from lassen import rules as lassen_rewrite_rules
 from lassen import LassenMapper
 
-from io_core.io_core_magma import IOCore
-from peak_core.peak_core import PeakCore
+# CoreIR modules produced by the mapper and the name of the CGRA core that
+# implements them
+_MODULE_CORES = {
+    "PE": "PE",
+    "io16": "io_core",
+    "Mem": "MemCore",
+}
+# cgralib.Mem ports that are named differently on MemCore. MemCore has a
+# single address port, so build_netlist() rejects a Mem that is both read and
+# written
+_MEM_PORTS = {
+    "wdata": "data_in",
+    "rdata": "data_out",
+    "waddr": "addr_in",
+    "raddr": "addr_in",
+    "wen": "wen_in",
+    "ren": "ren_in",
+}
+
+
+class _Unelaborated:
+    # stands in for the parts of Garnet that are not built when it is loaded
+    # from the elaboration cache
+    def __init__(self, what):
+        self.__what = what
+
+    def fail(self):
+        raise RuntimeError(f"Garnet has no {self.__what}: it was loaded from "
+                           f"the elaboration cache with bitstream_only=True, "
+                           f"which only supports compile(). Construct it "
+                           f"with bitstream_only=False to generate RTL")
+
+    def __getattr__(self, name):
+        self.fail()
+
+    def __getitem__(self, name):
+        self.fail()
 
 
 class Garnet(Generator):
-    def __init__(self, width, height, add_pd):
+    def __init__(self, width, height, add_pd, cache_dir="",
+                 bitstream_only=False, profiler=None, pnr_backend=None,
+                 pnr_dir=""):
         super().__init__()
 
+        self.width = width
+        self.height = height
+
         # configuration parameters
         config_addr_width = 32
         config_data_width = 32
@@ -50,28 +109,77 @@ class Garnet(Generator):
 
         # parallel configuration parameter
         num_parallel_cfg = math.ceil(width / 4)
+        self.num_parallel_cfg = num_parallel_cfg
 
         # number of input/output channels parameter
         num_io = math.ceil(width / 4)
 
-        self.global_controller = GlobalController(config_addr_width,
-                                                  config_data_width)
-        self.global_buffer = GlobalBuffer(num_banks=num_banks, num_io=num_io,
-                                          num_cfg=num_parallel_cfg,
-                                          bank_addr=bank_addr)
-
-        interconnect = create_cgra(width, height, io_side,
-                                   reg_addr_width=config_addr_reg_width,
-                                   config_data_width=config_data_width,
-                                   tile_id_width=tile_id_width,
-                                   num_tracks=num_tracks,
-                                   add_pd=add_pd,
-                                   global_signal_wiring
-                                   =GlobalSignalWiring.ParallelMeso,
-                                   num_parallel_config=num_parallel_cfg,
-                                   mem_ratio=(1, 4))
-        interconnect.dump_pnr("temp", "42")
+        mem_ratio = (1, 4)
+        global_signal_wiring = GlobalSignalWiring.ParallelMeso
+
+        self.mapper_initalized = False
+        self.__rewrite_rules = None
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        self.cache_dir = cache_dir
+        # where the PnR graphs are dumped, see dump_pnr()
+        self.pnr_dir = pnr_dir
+        self.__pnr_info = ""
+        self.pnr_backend = pnr_backend if pnr_backend is not None else \
+            default_backend()
+        # seed and per-seed statistics of the last multi-seed PnR
+        self.pnr_seed = 0
+        self.pnr_attempts = []
+
+        # elaborated interconnect cache. the fingerprint hashes the sources,
+        # so it is only computed once a cache or PnR dump needs it
+        self.__fingerprint_params = dict(
+            width=width, height=height, num_tracks=num_tracks, add_pd=add_pd,
+            mem_ratio=mem_ratio, global_signal_wiring=global_signal_wiring)
+        self.__fingerprint = ""
+        cache = ElaborationCache(cache_dir) if cache_dir else None
+        # False when only the compile flow is available, see circuit()
+        self.elaborated = True
+        if bitstream_only and cache is not None and \
+                self.fingerprint in cache:
+            # the compile flow only needs the routing graph and the register
+            # address map, skip the elaboration entirely
+            with self.profiler.span("load_cache"):
+                self.interconnect = cache.load(self.fingerprint, gen_pe)
+            self.__build_core_registry()
+            self.elaborated = False
+            self.global_controller = _Unelaborated("global_controller")
+            self.global_buffer = _Unelaborated("global_buffer")
+            self.ports = _Unelaborated("ports")
+            return
+
+        with self.profiler.span("global_controller"):
+            self.global_controller = GlobalController(config_addr_width,
+                                                      config_data_width)
+        with self.profiler.span("global_buffer"):
+            self.global_buffer = GlobalBuffer(num_banks=num_banks,
+                                              num_io=num_io,
+                                              num_cfg=num_parallel_cfg,
+                                              bank_addr=bank_addr)
+
+        with self.profiler.span("create_cgra"):
+            interconnect = create_cgra(
+                width, height, io_side,
+                reg_addr_width=config_addr_reg_width,
+                config_data_width=config_data_width,
+                tile_id_width=tile_id_width,
+                num_tracks=num_tracks,
+                add_pd=add_pd,
+                global_signal_wiring=global_signal_wiring,
+                num_parallel_config=num_parallel_cfg,
+                mem_ratio=mem_ratio)
         self.interconnect = interconnect
+        self.__build_core_registry()
+        if cache is not None and self.fingerprint not in cache:
+            with self.profiler.span("store_cache"):
+                cache.store(self.fingerprint, interconnect,
+                            {"config_addr_width": config_addr_width,
+                             "config_addr_reg_width": config_addr_reg_width,
+                             "tile_id_width": tile_id_width})
 
         self.add_ports(
             jtag=JTAGType,
@@ -81,69 +189,148 @@ class Garnet(Generator):
             axi4_ctrl=AXI4SlaveType(config_addr_width, config_data_width),
         )
 
-        # top <-> global controller ports connection
-        self.wire(self.ports.clk_in, self.global_controller.ports.clk_in)
-        self.wire(self.ports.reset_in, self.global_controller.ports.reset_in)
-        self.wire(self.ports.jtag, self.global_controller.ports.jtag)
-        self.wire(self.ports.axi4_ctrl, self.global_controller.ports.axi4_ctrl)
-
-        # top <-> global buffer ports connection
-        self.wire(self.ports.soc_data, self.global_buffer.ports.soc_data)
-        glc_interconnect_wiring(self)
-        glb_glc_wiring(self)
-        glb_interconnect_wiring(self, width, num_parallel_cfg)
-
-        self.mapper_initalized = False
-        self.__rewrite_rules = None
+        with self.profiler.span("global_wiring"):
+            # top <-> global controller ports connection
+            self.wire(self.ports.clk_in, self.global_controller.ports.clk_in)
+            self.wire(self.ports.reset_in,
+                      self.global_controller.ports.reset_in)
+            self.wire(self.ports.jtag, self.global_controller.ports.jtag)
+            self.wire(self.ports.axi4_ctrl,
+                      self.global_controller.ports.axi4_ctrl)
+
+            # top <-> global buffer ports connection
+            self.wire(self.ports.soc_data, self.global_buffer.ports.soc_data)
+            glc_interconnect_wiring(self)
+            glb_glc_wiring(self)
+            glb_interconnect_wiring(self, width, num_parallel_cfg)
 
     def set_rewrite_rules(self,rewrite_rules):
         self.__rewrite_rules = rewrite_rules
 
-    def initialize_mapper(self, rewrite_rules=None,discover=False):
+    @property
+    def fingerprint(self):
+        if not self.__fingerprint:
+            self.__fingerprint = fingerprint(**self.__fingerprint_params)
+        return self.__fingerprint
+
+    @property
+    def rewrite_rules(self):
+        return self.__rewrite_rules
+
+    def initialize_mapper(self, rewrite_rules=None,discover=False,
+                          num_workers=1, profiler=None):
         if self.mapper_initalized:
             raise RuntimeError("Can not initialize mapper twice")
+        if profiler is None:
+            profiler = self.profiler
         # Set up compiler and mapper.
         self.coreir_context = coreir.Context()
 
         #Initializes with all the custom rewrite rules
         self.mapper = LassenMapper(self.coreir_context)
+        self.__mapper_rules = []
 
         # Either load rewrite rules from cached file or generate them by
         # discovery.
         if rewrite_rules:
-            with open(rewrite_rules) as jfile:
-                rules = json.load(jfile)
-            for rule in rules:
-                self.mapper.add_rr_from_description(rule)
+            with profiler.span("load_rewrite_rules"):
+                with open(rewrite_rules) as jfile:
+                    rules = json.load(jfile)
+                for rule in rules:
+                    self.mapper.add_rr_from_description(rule)
+                self.__mapper_rules = rules
         elif discover:
-            # Hack to speed up rewrite rules discovery.
-            bypass_mode = lambda inst: (
-                inst.rega == type(inst.rega).BYPASS and
-                inst.regb == type(inst.regb).BYPASS and
-                inst.regd == type(inst.regd).BYPASS and
-                inst.rege == type(inst.rege).BYPASS and
-                inst.regf == type(inst.regf).BYPASS
-            )
-            self.mapper.add_discover_constraint(bypass_mode)
-            self.mapper.discover_peak_rewrite_rules(width=16)
+            # discovered rules only depend on the PE spec, so they are
+            # cached across runs
+            width = 16
+            rule_cache = RewriteRuleCache(self.cache_dir or
+                                          default_cache_dir())
+            key = rules_fingerprint(gen_pe, [bypass_mode], width)
+            rules = rule_cache.load(key)
+            if rules is not None:
+                with profiler.span("load_rewrite_rules"):
+                    for rule in rules:
+                        self.mapper.add_rr_from_description(rule)
+            elif num_workers != 1:
+                # split the search by ALU opcode across a process pool
+                with profiler.span("discover_rewrite_rules"):
+                    rules = discover_rules_parallel(alu_partitions(gen_pe),
+                                                    [bypass_mode], width,
+                                                    num_workers,
+                                                    print_progress)
+                for rule in rules:
+                    self.mapper.add_rr_from_description(rule)
+                rule_cache.store(key, rules)
+            else:
+                with profiler.span("discover_rewrite_rules"):
+                    self.mapper.add_discover_constraint(bypass_mode)
+                    rules = self.mapper.discover_peak_rewrite_rules(
+                        width=width, serialize=True)
+                rule_cache.store(key, rules)
+            self.__mapper_rules = rules
         else:
-            for rule in lassen_rewrite_rules:
-                self.mapper.add_rr_from_description(rule)
+            with profiler.span("load_rewrite_rules"):
+                for rule in lassen_rewrite_rules:
+                    self.mapper.add_rr_from_description(rule)
+            self.__mapper_rules = lassen_rewrite_rules
 
         self.mapper_initalized = True
 
+    def reset_mapper(self, profiler=None):
+        # moves the mapper to a fresh coreir context, so that the next app
+        # does not collide with the modules of the ones mapped before. the
+        # rewrite rules are reloaded from their descriptions
+        assert self.mapper_initalized
+        if profiler is None:
+            profiler = self.profiler
+        with profiler.span("load_rewrite_rules"):
+            self.coreir_context = coreir.Context()
+            self.mapper = LassenMapper(self.coreir_context)
+            for rule in self.__mapper_rules:
+                self.mapper.add_rr_from_description(rule)
+
     def map(self, halide_src):
         assert self.mapper_initalized
         app = self.coreir_context.load_from_file(halide_src)
         self.mapper.map_app(app)
         instrs = self.mapper.extract_instr_map(app)
+        # memories are not mapped by the PE mapper; they are configured
+        # straight from their cgralib.Mem modargs
+        for instance in app.definition.instances:
+            if instance.module.name == "Mem":
+                instrs[instance.name] = {key: value.value for key, value in
+                                         instance.config.items()}
         return app, instrs
 
-    def run_pnr(self, info_file, mapped_file):
-        cgra_path = os.getenv("CGRA_PNR", "")
-        assert cgra_path != "", "Cannot find CGRA PnR"
-        entry_point = os.path.join(cgra_path, "scripts", "pnr_flow.sh")
-        subprocess.check_call([entry_point, info_file, mapped_file])
+    def dump_pnr(self):
+        # the graphs are only needed by the PnR tools, so they are dumped on
+        # first use and reused as long as the design does not change. the
+        # default location is per design inside the cache directory
+        if not self.__pnr_info:
+            dir_name = self.pnr_dir
+            if not dir_name and self.cache_dir:
+                dir_name = os.path.join(self.cache_dir, "pnr_graph",
+                                        self.fingerprint)
+            elif not dir_name:
+                dir_name = "temp"
+            self.__pnr_info = dump_pnr_once(self.interconnect,
+                                            os.path.abspath(dir_name),
+                                            "garnet", self.fingerprint)
+        return self.__pnr_info
+
+    @contextlib.contextmanager
+    def __mapped_app_file(self, mapped, info_file):
+        # backends that pack the app themselves read the mapped app from a
+        # file and write their results next to it, so every compile gets a
+        # private work dir next to the graph dump
+        if not self.pnr_backend.needs_mapped_app:
+            yield ""
+            return
+        with tempfile.TemporaryDirectory(
+                dir=os.path.dirname(info_file)) as work_dir:
+            app_file = os.path.join(work_dir, "mapped.json")
+            mapped.save_to_file(app_file)
+            yield app_file
 
     def get_placement_bitstream(self, placement, id_to_name, instrs):
         result = []
@@ -152,117 +339,143 @@ class Garnet(Generator):
             if instance not in instrs:
                 continue
             instr = instrs[instance]
-            result += self.interconnect.configure_placement(x, y, instr)
+            if node[0] == self.__mem_tag:
+                result += self.__configure_mem(x, y, instr)
+            else:
+                result += self.interconnect.configure_placement(x, y, instr)
         return result
 
-    @staticmethod
-    def __instance_to_int(mod: coreir.module.Module):
-        top_def = mod.definition
-        result = {}
-        instances = {}
-
-        for instance in top_def.instances:
-            instance_name = instance.name
-            assert instance_name not in result
-            result[instance_name] = str(len(result))
-            instances[instance_name] = instance
-        return result, instances
-
-    def __get_available_cores(self):
-        result = {}
+    def __configure_mem(self, x, y, instr):
+        # canal only configures cores that are their own feature
+        tile = self.interconnect.tile_circuits[(x, y)]
+        feature_index = core_feature_index(tile)
+        return [(self.interconnect.get_config_addr(reg_addr, feature_index,
+                                                   x, y), data)
+                for reg_addr, data in mem_config_bitstream(instr)]
+
+    def __build_core_registry(self):
+        # maps each CoreIR module the mapper produces to its PnR tag and a
+        # core prototype. cores are looked up by name since generators are
+        # not hashable; this walks the array once instead of per compile
+        cores = {}
         for tile in self.interconnect.tile_circuits.values():
             core = tile.core
+            if core is None or core.name() in cores:
+                continue
             tags = core.pnr_info()
             if not isinstance(tags, list):
                 tags = [tags]
-            for tag in tags:
-                if tag.tag_name not in result:
-                    result[tag.tag_name] = tag, core
-        return result
+            cores[core.name()] = tags, core
+        self.core_registry = {}
+        for module_name, core_name in _MODULE_CORES.items():
+            if core_name not in cores:
+                continue
+            tags, core = cores[core_name]
+            self.core_registry[module_name] = tags[0].tag_name, core
+        self.__mem_tag = self.core_registry.get("Mem", (None, None))[0]
+
+    def __core_tag(self, module_name):
+        if module_name not in self.core_registry:
+            raise ValueError(f"Cannot find CGRA core for {module_name}. "
+                             f"Is the mapper working?")
+        return self.core_registry[module_name][0]
+
+    def __core_port(self, tag, port):
+        if tag == self.__mem_tag:
+            return _MEM_PORTS.get(port, port)
+        return port
 
     def convert_mapped_to_netlist(self, mapped):
-        instance_id, instances = self.__instance_to_int(mapped)
-        core_tags = self.__get_available_cores()
-        name_to_id = {}
-        module_name_to_tag = {}
-        netlist = {}
-        bus = {}
-        # map instances to tags
-        for instance_name, instance in instances.items():
-            module_name = instance.module.name
-            if module_name == "PE":
-                # it's a PE core
-                # FIXME: because generators are not hashable, we can't reverse
-                #   index table search the tags
-                #   after @perf branch is merged into master, we need to
-                #   refactor the following code
-                if module_name not in module_name_to_tag:
-                    instance_tag = ""
-                    for tag_name, (tag, core) in core_tags.items():
-                        if isinstance(core, PeakCore):
-                            instance_tag = tag_name
-                            break
-                    assert instance_tag != "", "Cannot find the core"
-                    module_name_to_tag[module_name] = instance_tag
-            elif instance.module.name == "io16":
-                # it's an IO core
-                if module_name not in module_name_to_tag:
-                    instance_tag = ""
-                    for tag_name, (tag, core) in core_tags.items():
-                        if isinstance(core, IOCore):
-                            instance_tag = tag_name
-                            break
-                    assert instance_tag != "", "Cannot find the core"
-                    module_name_to_tag[module_name] = instance_tag
-            else:
-                raise ValueError(f"Cannot find CGRA core for {module_name}. "
-                                 f"Is the mapper working?")
-
-            name_to_id[instance_name] = module_name_to_tag[module_name] + \
-                instance_id[instance_name]
-        # get connections
-        src_to_net_id = {}
-        for conn in mapped.directed_module.connections:
-            assert len(conn.source) == 2
-            assert len(conn.sink) == 2
-            src_name, src_port = conn.source
-            dst_name, dst_port = conn.sink
-            src_id = name_to_id[src_name]
-            dst_id = name_to_id[dst_name]
-            if (src_name, src_port) not in src_to_net_id:
-                net_id = "e" + str(len(netlist))
-                netlist[net_id] = [(src_id, src_port)]
-                src_to_net_id[(src_name, src_port)] = net_id
-            else:
-                net_id = src_to_net_id[(src_name, src_port)]
-            netlist[net_id].append((dst_id, dst_port))
-            # get bus width
-            src_instance = instances[src_name]
-            width = src_instance.select(src_port).type.size
-            if net_id in bus:
-                assert bus[net_id] == width
+        return build_netlist(mapped, self.__core_tag, self.__core_port)
+
+    def __pnr_bitstream(self, instrs, placement, routing, id_to_name):
+        # placement and routing are returned in a picklable form as well so
+        # that multi-seed results can be cached
+        bitstream = self.interconnect.get_route_bitstream(routing) + \
+            self.get_placement_bitstream(placement, id_to_name, instrs)
+        return bitstream, placement, dump_routing(routing), id_to_name
+
+    def compile(self, halide_src, profiler=None, compact=False,
+                pnr_seeds=1, pnr_workers=None):
+        # stages are recorded into @profiler, which defaults to the profiler
+        # Garnet was constructed with
+        if profiler is None:
+            profiler = self.profiler
+        with profiler.span("compile", app=halide_src):
+            if not self.mapper_initalized:
+                with profiler.span("initialize_mapper"):
+                    self.initialize_mapper(self.__rewrite_rules,
+                                           profiler=profiler)
+            with profiler.span("map"):
+                mapped, instrs = self.map(halide_src)
+            assert len(instrs) > 0
+            # id to name converts the id to instance name
+            with profiler.span("convert_mapped_to_netlist"):
+                netlist, bus, id_to_name = \
+                    self.convert_mapped_to_netlist(mapped)
+            # placement and routing only depend on the netlist and the array
+            cached = None
+            if self.cache_dir:
+                pnr_cache = PnRCache(self.cache_dir)
+                key = pnr_cache.key(netlist, bus, self.fingerprint, pnr_seeds,
+                                    self.pnr_backend.name)
+                with profiler.span("load_pnr_cache"):
+                    cached = pnr_cache.load(key, self.interconnect)
+            bitstream = None
+            if cached is not None:
+                self.pnr_seed, placement, routing, id_to_name = cached
+                self.pnr_attempts = []
+            elif pnr_seeds > 1:
+                with profiler.span("dump_pnr"):
+                    info_file = self.dump_pnr()
+                # every seed produces its own bitstream in the worker, only
+                # the best one is kept
+                with profiler.span("pnr", seeds=pnr_seeds), \
+                        self.__mapped_app_file(mapped, info_file) as app_file:
+                    best, self.pnr_attempts = pnr_multi_seed(
+                        self.pnr_backend, self.interconnect, netlist, bus,
+                        id_to_name, range(pnr_seeds),
+                        functools.partial(self.__pnr_bitstream, instrs),
+                        pnr_workers, info_file, app_file)
+                self.pnr_seed, _, result = best
+                bitstream, placement, routing, id_to_name = result
+                if self.cache_dir:
+                    with profiler.span("store_pnr_cache"):
+                        pnr_cache.store(key, self.pnr_seed, placement,
+                                        routing, id_to_name)
             else:
-                bus[net_id] = width
-
-        id_to_name = {}
-        for name, id in name_to_id.items():
-            id_to_name[id] = name
-        return netlist, bus, id_to_name
-
-    def compile(self, halide_src):
-        if not self.mapper_initalized:
-            self.initialize_mapper(self.__rewrite_rules)
-        mapped, instrs = self.map(halide_src)
-        # id to name converts the id to instance name
-        netlist, bus, id_to_name = self.convert_mapped_to_netlist(mapped)
-        placement, routing = archipelago.pnr(self.interconnect, (netlist, bus))
-        bitstream = []
-        bitstream += self.interconnect.get_route_bitstream(routing)
-        assert len(instrs) > 0
-        bitstream += self.get_placement_bitstream(placement, id_to_name,
-                                                  instrs)
+                with profiler.span("dump_pnr"):
+                    info_file = self.dump_pnr()
+                with profiler.span("pnr"), \
+                        self.__mapped_app_file(mapped, info_file) as app_file:
+                    placement, routing, id_to_name = \
+                        self.pnr_backend.place_and_route(
+                            self.interconnect, netlist, bus, id_to_name,
+                            app_file, info_file)
+                if self.cache_dir:
+                    with profiler.span("store_pnr_cache"):
+                        pnr_cache.store(key, 0, placement,
+                                        dump_routing(routing), id_to_name)
+            if bitstream is None:
+                bitstream = []
+                with profiler.span("route_bitstream"):
+                    bitstream += self.interconnect.get_route_bitstream(
+                        routing)
+                with profiler.span("placement_bitstream"):
+                    bitstream += self.get_placement_bitstream(placement,
+                                                              id_to_name,
+                                                              instrs)
+            if compact:
+                with profiler.span("compact_bitstream"):
+                    bitstream = compact_bitstream(
+                        bitstream, self.interconnect.tile_id_width)
         return bitstream
 
+    def circuit(self):
+        if not self.elaborated:
+            _Unelaborated("circuit").fail()
+        return super().circuit()
+
     def name(self):
         return "Garnet"
 
@@ -274,25 +487,167 @@ def main():
     parser.add_argument("--input-netlist", type=str, default="", dest="input")
     parser.add_argument("--output-bitstream", type=str, default="",
                         dest="output")
+    parser.add_argument("--bitstream-format", type=str, default="text",
+                        choices=FORMATS)
+    # merge writes to the same register, drop writes of reset values and
+    # order writes by tile
+    parser.add_argument("--compact-bitstream", action="store_true",
+                        dest="compact")
+    # additionally write one bitstream per global buffer parallel config
+    # channel, for fast reconfiguration driven by the global buffer
+    parser.add_argument("--parallel-config", action="store_true")
+    # only emit the writes needed to switch from the app configured by this
+    # bitstream to the new one
+    parser.add_argument("--previous-bitstream", type=str, default="")
+    # estimate how long the bitstream takes to load over JTAG, AXI4-lite and
+    # the global buffer at these clock frequencies
+    parser.add_argument("--config-time", action="store_true")
+    parser.add_argument("--tck-mhz", type=float, default=10)
+    parser.add_argument("--clk-mhz", type=float, default=500)
+    # also write the JTAG vectors that load the bitstream, e.g. for bring-up
+    parser.add_argument("--jtag-vectors", type=str, default="")
+    parser.add_argument("--jtag-format", type=str, default="svf",
+                        choices=JTAG_FORMATS)
     parser.add_argument("-v", "--verilog", action="store_true")
     parser.add_argument("--no-pd", "--no-power-domain", action="store_true")
     parser.add_argument("--rewrite-rules", type=str, default="")
+    parser.add_argument("--cache-dir", type=str,
+                        default=os.getenv("GARNET_CACHE_DIR", ""))
+    # "-" serves JSON requests over stdin/stdout, anything else is used as
+    # the path of a unix socket
+    parser.add_argument("--serve", type=str, nargs="?", const="-",
+                        default="")
+    # directory of CoreIR apps or a manifest file. bitstreams are written to
+    # the --output-bitstream directory
+    parser.add_argument("--batch", type=str, default="")
+    parser.add_argument("-j", "--jobs", type=int, default=None)
+    # place and route with this many seeds in parallel (-j processes) and
+    # keep the best result
+    parser.add_argument("--pnr-seeds", type=int, default=1)
+    # where the PnR graphs are dumped on first use. defaults to a per design
+    # directory in the cache, or ./temp without a cache
+    parser.add_argument("--pnr-dir", type=str, default="")
+    # defaults to archipelago if it is installed, the CGRA_PNR scripts
+    # otherwise
+    parser.add_argument("--pnr-backend", type=str, default="",
+                        choices=[""] + list(PNR_BACKENDS))
+    parser.add_argument("--profile-out", type=str, default="")
+    parser.add_argument("--profile-format", type=str, default="chrome",
+                        choices=["chrome", "json"])
     args = parser.parse_args()
 
     assert args.width % 4 == 0 and args.width >= 4
-    garnet = Garnet(width=args.width, height=args.height, add_pd=not args.no_pd)
+    if args.batch and args.profile_out:
+        # apps are compiled in worker processes, which only report the time
+        # of each stage
+        parser.error("--profile-out is not supported with --batch")
+    if args.batch:
+        sys.exit(batch_main(args))
+    bitstream_only = not args.verilog and \
+        (len(args.input) > 0 or len(args.serve) > 0)
+    profiler = Profiler() if args.profile_out else None
+    garnet = Garnet(width=args.width, height=args.height, add_pd=not args.no_pd,
+                    cache_dir=args.cache_dir,
+                    bitstream_only=bitstream_only, profiler=profiler,
+                    pnr_backend=pnr_backend(args), pnr_dir=args.pnr_dir)
     if args.rewrite_rules:
         garnet.set_rewrite_rules(args.rewrite_rules)
     if args.verilog:
         garnet_circ = garnet.circuit()
         magma.compile("garnet", garnet_circ, output="coreir-verilog")
+    if args.serve:
+        server = CompileServer(garnet)
+        if args.serve == "-":
+            server.serve_stdio()
+        else:
+            server.serve_unix(args.serve)
+        return
     if len(args.input) > 0 and len(args.output) > 0:
         # do PnR and produce bitstream
-        bitstream = garnet.compile(args.input)
-        with open(args.output, "w+") as f:
-            bs = ["{0:08X} {1:08X}".format(entry[0], entry[1]) for entry
-                  in bitstream]
-            f.write("\n".join(bs))
+        bitstream = garnet.compile(args.input, compact=args.compact,
+                                   pnr_seeds=args.pnr_seeds,
+                                   pnr_workers=args.jobs)
+        if args.pnr_seeds > 1:
+            print_attempts(garnet.pnr_attempts, garnet.pnr_seed)
+        if args.previous_bitstream:
+            bitstream = diff_bitstream(
+                read_bitstream(args.previous_bitstream), bitstream,
+                tile_id_width=garnet.interconnect.tile_id_width)
+        write_bitstream(args.output, bitstream, args.bitstream_format,
+                        garnet.width, garnet.height,
+                        garnet.interconnect.tile_id_width)
+        if args.parallel_config:
+            write_parallel_config(garnet, bitstream, args.output,
+                                  args.bitstream_format)
+        if args.config_time:
+            print_config_time(garnet, bitstream, args.tck_mhz, args.clk_mhz)
+        if args.jtag_vectors:
+            write_jtag_vectors(args.jtag_vectors, bitstream, args.jtag_format)
+    if profiler is not None:
+        profiler.dump(args.profile_out, args.profile_format)
+
+
+def pnr_backend(args):
+    return PNR_BACKENDS[args.pnr_backend]() if args.pnr_backend else None
+
+
+def write_parallel_config(garnet, bitstream, output, bitstream_format):
+    tile_id_width = garnet.interconnect.tile_id_width
+    partitions = partition_bitstream(bitstream, garnet.width,
+                                     garnet.num_parallel_cfg, tile_id_width)
+    base, ext = os.path.splitext(output)
+    for i, partition in enumerate(partitions):
+        write_bitstream(f"{base}_cfg{i}{ext}", partition, bitstream_format,
+                        garnet.width, garnet.height, tile_id_width)
+    summary = channel_summary(partitions)
+    print(f"parallel config: {summary['counts']} writes per channel, "
+          f"{summary['speedup']:.2f}x over serial configuration")
+
+
+def print_config_time(garnet, bitstream, tck_mhz, clk_mhz):
+    estimate = estimate_config_time(
+        bitstream, garnet.width, garnet.num_parallel_cfg,
+        tile_id_width=garnet.interconnect.tile_id_width)
+    preloaded = config_seconds(estimate, tck_mhz * 1e6, clk_mhz * 1e6)
+    loaded = config_seconds(estimate, tck_mhz * 1e6, clk_mhz * 1e6,
+                            preloaded=False)
+    print(f"config time for {estimate['writes']} writes:")
+    print(f"  jtag: {estimate['jtag']} cycles, "
+          f"{preloaded['jtag'] * 1e3:.3f} ms")
+    print(f"  axi:  {estimate['axi']} cycles, "
+          f"{preloaded['axi'] * 1e3:.3f} ms")
+    print(f"  glb:  {estimate['glb']} cycles, "
+          f"{preloaded['glb'] * 1e3:.3f} ms "
+          f"({loaded['glb'] * 1e3:.3f} ms including the global buffer load)")
+
+
+def batch_main(args):
+    garnet_factory = functools.partial(Garnet, width=args.width,
+                                       height=args.height,
+                                       add_pd=not args.no_pd,
+                                       cache_dir=args.cache_dir,
+                                       bitstream_only=True,
+                                       pnr_backend=pnr_backend(args),
+                                       pnr_dir=args.pnr_dir)
+    if args.cache_dir or args.pnr_dir:
+        # populate the cache and the PnR graphs once so that workers do not
+        # elaborate or dump the array concurrently
+        garnet_factory().dump_pnr()
+    apps = find_apps(args.batch)
+    num_failed = 0
+    for app, output, error, timings in compile_batch(garnet_factory, apps,
+                                                     args.output,
+                                                     args.jobs,
+                                                     args.rewrite_rules,
+                                                     args.bitstream_format,
+                                                     args.compact):
+        if error is None:
+            print(f"{app} -> {output} ({timings.get('compile', 0):.2f}s)")
+        else:
+            num_failed += 1
+            print(f"{app} FAILED\n{error}", file=sys.stderr)
+    print(f"{len(apps) - num_failed}/{len(apps)} apps compiled")
+    return 1 if num_failed else 0
 
 
 if __name__ == "__main__":
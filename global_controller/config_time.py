@@ -0,0 +1,152 @@
+"""Analytic estimate of how long a bitstream takes to load on each path
+
+Three paths are modeled:
+  * jtag: every write is shifted into the config data, address and op
+    registers of the global controller's TAP (cfg_and_dbg) and counted in
+    TCK cycles. The controller runs on TCK while it is configured over JTAG.
+  * axi: every write is one AXI4-lite write transaction to the global
+    controller, in system clock cycles.
+  * glb: the global buffer streams a preloaded bitstream over its parallel
+    config channels, one write per channel and cycle. glb_load is the time
+    it takes to load the bitstream into the global buffer over AXI.
+
+A CONFIG_WRITE keeps the controller busy for rw_delay_sel + 1 cycles, as in
+the functional model (gen_global_controller).
+"""
+import math
+from typing import Iterable, Tuple
+from bitstream.partition import config_channel
+from global_controller.global_controller import GCOp, RW_DELAY_SEL_RESET
+
+
+# instructions of the system clock config bus (cfg_and_dbg.svp)
+JTAG_IR_WIDTH = 5
+JTAG_CFG_DATA = 0x8
+JTAG_CFG_INST = 0x9
+JTAG_CFG_ADDR = 0xA
+# an op shifted in over JTAG goes through a 4 flop synchronizer
+JTAG_SYNC_CYCLES = 4
+# AW and W handshakes, after which the write fsm waits in WRDELAY and WRWAIT
+# for the controller to finish the op
+AXI_HANDSHAKE_CYCLES = 2
+AXI_MIN_WAIT_CYCLES = 2
+# writes that are not config writes (global buffer SRAM, config_start) do
+# not wait for rw_delay_sel
+AXI_REG_WRITE_CYCLES = AXI_HANDSHAKE_CYCLES + AXI_MIN_WAIT_CYCLES
+# a global buffer config entry is an (addr, data) pair of 32 bit words
+GLB_WORDS_PER_WRITE = 2
+
+
+def ir_scan_cycles(width: int = JTAG_IR_WIDTH):
+    # Run-Test/Idle -> Select-DR -> Select-IR -> Capture-IR -> Shift-IR
+    # (width cycles, the last one exits) -> Update-IR -> Run-Test/Idle
+    return width + 6
+
+
+def dr_scan_cycles(width: int):
+    return width + 5
+
+
+def gc_write_cycles(rw_delay: int = RW_DELAY_SEL_RESET):
+    return rw_delay + 1
+
+
+def axi_write_cycles(rw_delay: int = RW_DELAY_SEL_RESET):
+    return AXI_HANDSHAKE_CYCLES + max(AXI_MIN_WAIT_CYCLES,
+                                      gc_write_cycles(rw_delay))
+
+
+def jtag_scans(bitstream: Iterable[Tuple[int, int]],
+               config_data_width: int = 32, config_addr_width: int = 32,
+               config_op_width: int = 5):
+    """
+    Yields, for every write of @bitstream, the (instruction, value, width)
+    data register scans that issue it over JTAG. The data and address
+    registers hold their value, so they are only scanned when it changes.
+    Scanning the op issues the write.
+    """
+    last_addr = None
+    last_data = None
+    op = GCOp.CONFIG_WRITE.value
+    for addr, data in bitstream:
+        scans = []
+        if data != last_data:
+            scans.append((JTAG_CFG_DATA, data, config_data_width))
+            last_data = data
+        if addr != last_addr:
+            scans.append((JTAG_CFG_ADDR, addr, config_addr_width))
+            last_addr = addr
+        scans.append((JTAG_CFG_INST, op, config_op_width))
+        yield scans
+
+
+def estimate_config_time(bitstream: Iterable[Tuple[int, int]], width: int,
+                         num_channels: int = 0,
+                         rw_delay: int = RW_DELAY_SEL_RESET,
+                         tile_id_width: int = 16,
+                         config_data_width: int = 32,
+                         config_addr_width: int = 32,
+                         config_op_width: int = 5):
+    """
+    Returns the number of cycles it takes to load @bitstream on each path in
+    a single pass over it. @num_channels defaults to the global buffer's
+    ceil(@width / 4) parallel config channels.
+    """
+    if not num_channels:
+        num_channels = math.ceil(width / 4)
+    channels = [0] * num_channels
+
+    def count(entries):
+        for addr, data in entries:
+            channels[config_channel(addr, width, num_channels,
+                                    tile_id_width)] += 1
+            yield addr, data
+
+    # the next op can only be issued once the controller is done with the
+    # previous one
+    gc_busy = gc_write_cycles(rw_delay) + JTAG_SYNC_CYCLES
+    jtag = 0
+    busy = 0
+    instruction = None
+    for scans in jtag_scans(count(bitstream), config_data_width,
+                            config_addr_width, config_op_width):
+        cycles = 0
+        for scan_instruction, _, scan_width in scans:
+            if scan_instruction != instruction:
+                cycles += ir_scan_cycles()
+                instruction = scan_instruction
+            cycles += dr_scan_cycles(scan_width)
+        jtag += max(cycles, busy)
+        busy = gc_busy
+    jtag += busy
+
+    num_writes = sum(channels)
+    # the global buffer starts once config_start is written
+    glb = AXI_REG_WRITE_CYCLES + max(channels)
+    glb_load = num_writes * GLB_WORDS_PER_WRITE * AXI_REG_WRITE_CYCLES
+    return {"writes": num_writes,
+            "jtag": jtag,
+            "axi": num_writes * axi_write_cycles(rw_delay),
+            "glb": glb,
+            "glb_load": glb_load,
+            "channels": channels}
+
+
+def config_seconds(estimate, tck_hz: float, clk_hz: float,
+                   preloaded: bool = True):
+    """
+    Converts an estimate into seconds per path. Unless @preloaded, loading
+    the global buffer is included in the glb path.
+    """
+    glb = estimate["glb"]
+    if not preloaded:
+        glb += estimate["glb_load"]
+    return {"jtag": estimate["jtag"] / tck_hz,
+            "axi": estimate["axi"] / clk_hz,
+            "glb": glb / clk_hz}
+
+
+def fastest_path(estimate, tck_hz: float, clk_hz: float,
+                 preloaded: bool = True):
+    seconds = config_seconds(estimate, tck_hz, clk_hz, preloaded)
+    return min(seconds.items(), key=lambda item: item[1])
@@ -1,8 +1,10 @@
 from gemstone.common.configurable_model import ConfigurableModel
 from hwtypes import BitVector
 from enum import Enum
+import itertools
 import magma as m
 import fault
+import numpy as np
 
 
 class GCRegAddr(Enum):
@@ -32,22 +34,183 @@ class GCOp(Enum):
     READ_CLK_SWITCH_DELAY_SEL = 16
 
 
+# value of rw_delay_sel after reset: how many cycles read/write are asserted
+# for by CONFIG_READ and CONFIG_WRITE
+RW_DELAY_SEL_RESET = 2
+# outputs recorded by the compact model
+_OUTPUTS = ("stall", "reset_out", "config_addr_out", "config_data_out",
+            "read", "write", "config_data_to_jtag")
+# number of bitstream entries applied per bulk step
+_CHUNK_SIZE = 1 << 16
+
+
+def _as_int(value):
+    # unknown values (e.g. config_data_in before it is set) are recorded as -1
+    if value is fault.UnknownValue:
+        return -1
+    if isinstance(value, BitVector):
+        return value.as_uint()
+    return int(value)
+
+
+class Waveform:
+    """
+    Run length encoded waveform of one output: run i holds values[i] for
+    lengths[i] cycles. The runs are stored in numpy arrays that grow by
+    doubling, and adjacent runs with the same value are merged.
+    """
+    def __init__(self, capacity: int = 64):
+        self.__values = np.zeros(capacity, dtype=np.int64)
+        self.__lengths = np.zeros(capacity, dtype=np.int64)
+        self.__size = 0
+        self.__cycles = 0
+
+    def __len__(self):
+        return self.__cycles
+
+    @property
+    def num_runs(self):
+        return self.__size
+
+    @property
+    def values(self):
+        return self.__values[:self.__size]
+
+    @property
+    def lengths(self):
+        return self.__lengths[:self.__size]
+
+    def append(self, value: int, length: int = 1):
+        self.extend([value], [length])
+
+    def extend(self, values, lengths):
+        values = np.asarray(values, dtype=np.int64)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        nonzero = lengths > 0
+        values = values[nonzero]
+        lengths = lengths[nonzero]
+        if len(values) == 0:
+            return
+        self.__cycles += int(lengths.sum())
+        # merge equal neighbours first, then the first new run into the
+        # current last run
+        starts = np.flatnonzero(np.concatenate(([True],
+                                                values[1:] != values[:-1])))
+        values = values[starts]
+        lengths = np.add.reduceat(lengths, starts)
+        if self.__size and values[0] == self.__values[self.__size - 1]:
+            self.__lengths[self.__size - 1] += lengths[0]
+            values = values[1:]
+            lengths = lengths[1:]
+            if len(values) == 0:
+                return
+        size = self.__size + len(values)
+        if size > len(self.__values):
+            capacity = max(size, 2 * len(self.__values))
+            self.__values = np.resize(self.__values, capacity)
+            self.__lengths = np.resize(self.__lengths, capacity)
+        self.__values[self.__size:size] = values
+        self.__lengths[self.__size:size] = lengths
+        self.__size = size
+
+    def value_at(self, cycle: int):
+        if not 0 <= cycle < self.__cycles:
+            raise IndexError(cycle)
+        ends = np.cumsum(self.lengths)
+        return int(self.values[np.searchsorted(ends, cycle, side="right")])
+
+    def expand(self):
+        # one value per cycle
+        return np.repeat(self.values, self.lengths)
+
+
+def _register(addr: GCRegAddr):
+    # a register of the register file, which holds a list of values like the
+    # outputs do
+    def get(self):
+        return self.regs[addr.value]
+
+    def set(self, value):
+        self.regs[addr.value] = value
+
+    return property(get, set)
+
+
+# GC registers read and written by the register ops
+_REG_READS = {
+    GCOp.READ_TST: GCRegAddr.TST_ADDR,
+    GCOp.READ_STALL: GCRegAddr.STALL_ADDR,
+    GCOp.READ_CLK_DOMAIN: GCRegAddr.CLK_SEL_ADDR,
+    GCOp.READ_RW_DELAY_SEL: GCRegAddr.RW_DELAY_SEL_ADDR,
+    GCOp.READ_CLK_SWITCH_DELAY_SEL: GCRegAddr.CLK_SWITCH_DELAY_SEL_ADDR,
+}
+_REG_WRITES = {
+    GCOp.WRITE_TST: GCRegAddr.TST_ADDR,
+    GCOp.WRITE_STALL: GCRegAddr.STALL_ADDR,
+    GCOp.SWITCH_CLK: GCRegAddr.CLK_SEL_ADDR,
+    GCOp.WRITE_RW_DELAY_SEL: GCRegAddr.RW_DELAY_SEL_ADDR,
+    GCOp.WRITE_CLK_SWITCH_DELAY_SEL: GCRegAddr.CLK_SWITCH_DELAY_SEL_ADDR,
+}
+
+
+def _op_handlers():
+    # handler(gc, addr, data) of every op, indexed by its opcode
+    handlers = [None] * (max(op.value for op in GCOp) + 1)
+    handlers[GCOp.NOP.value] = lambda gc, addr, data: None
+    handlers[GCOp.CONFIG_WRITE.value] = \
+        lambda gc, addr, data: gc.config_write(addr, data)
+    handlers[GCOp.CONFIG_READ.value] = \
+        lambda gc, addr, data: gc.config_read(addr)
+    handlers[GCOp.WRITE_A050.value] = lambda gc, addr, data: gc.wr_A050()
+    handlers[GCOp.GLOBAL_RESET.value] = \
+        lambda gc, addr, data: gc.global_reset(data)
+    handlers[GCOp.ADVANCE_CLK.value] = \
+        lambda gc, addr, data: gc.advance_clk(addr, data)
+    for op, reg in _REG_READS.items():
+        handlers[op.value] = \
+            lambda gc, addr, data, reg=reg: gc.read_gc_reg(reg)
+    for op, reg in _REG_WRITES.items():
+        handlers[op.value] = \
+            lambda gc, addr, data, reg=reg: gc.write_gc_reg(reg, data)
+    return handlers
+
+
+_OP_HANDLERS = _op_handlers()
+
+
 def gen_global_controller(config_data_width: int,
                           config_addr_width: int,
                           config_op_width: int):
 
     class _GlobalController(ConfigurableModel(32, 32)):
-        def __init__(self):
+        # the GC registers live in self.regs, indexed by GCRegAddr
+        TST = _register(GCRegAddr.TST_ADDR)
+        stall = _register(GCRegAddr.STALL_ADDR)
+        clk_sel = _register(GCRegAddr.CLK_SEL_ADDR)
+        rw_delay_sel = _register(GCRegAddr.RW_DELAY_SEL_ADDR)
+        clk_switch_delay_sel = _register(GCRegAddr.CLK_SWITCH_DELAY_SEL_ADDR)
+
+        def __init__(self, compact: bool = False):
             super().__init__()
             self.num_stall_domains = 4
+            self.reg_widths = [0] * len(GCRegAddr)
+            self.reg_widths[GCRegAddr.TST_ADDR.value] = config_data_width
+            self.reg_widths[GCRegAddr.STALL_ADDR.value] = \
+                self.num_stall_domains
+            self.reg_widths[GCRegAddr.CLK_SEL_ADDR.value] = 1
+            self.reg_widths[GCRegAddr.RW_DELAY_SEL_ADDR.value] = \
+                config_data_width
+            self.reg_widths[GCRegAddr.CLK_SWITCH_DELAY_SEL_ADDR.value] = 1
+            # the compact model records every output as a Waveform in
+            # self.waveforms instead of returning per-op lists, and applies
+            # config writes in bulk
+            self.compact = compact
             self.reset()
 
         def reset(self):
-            self.TST = [BitVector(0, config_data_width)]
-            self.stall = [BitVector(0, self.num_stall_domains)]
-            self.clk_sel = [BitVector(0, 1)]
-            self.rw_delay_sel = [BitVector(2, config_data_width)]
-            self.clk_switch_delay_sel = [BitVector(0, 1)]
+            self.regs = [[BitVector(0, width)] for width in self.reg_widths]
+            self.rw_delay_sel = [BitVector(RW_DELAY_SEL_RESET,
+                                           config_data_width)]
 
             self.reset_out = [0]
             self.config_addr_out = [BitVector(0, config_addr_width)]
@@ -56,6 +219,13 @@ def gen_global_controller(config_data_width: int,
             self.read = [0]
             self.write = [0]
             self.config_data_to_jtag = [BitVector(0, config_data_width)]
+            self.waveforms = {name: Waveform() for name in _OUTPUTS} \
+                if self.compact else {}
+
+        @property
+        def cycles(self):
+            # number of cycles recorded by the compact model
+            return len(self.waveforms["write"]) if self.compact else 0
 
         def config_read(self, addr):
             rw_delay = self.rw_delay_sel[0]
@@ -77,34 +247,71 @@ def gen_global_controller(config_data_width: int,
             self.config_data_out = [BitVector(data, config_data_width)] \
                 * (duration + 1)
 
+        def config_write_many(self, bitstream):
+            """
+            Applies CONFIG_WRITE for every (addr, data) in @bitstream. The
+            compact model applies the writes in chunks with numpy without
+            building per-op lists. Not to be confused with the
+            configure(addr, data) inherited from ConfigurableModel.
+            """
+            bitstream = iter(bitstream)
+            if not self.compact:
+                return self.run((GCOp.CONFIG_WRITE, addr, data) for
+                                addr, data in bitstream)
+            self.__cleanup()
+            while True:
+                chunk = list(itertools.islice(bitstream, _CHUNK_SIZE))
+                if not chunk:
+                    break
+                self.__config_write_many(np.array(chunk, dtype=np.int64))
+            return self
+
+        def __config_write_many(self, entries):
+            num_writes = len(entries)
+            duration = self.rw_delay_sel[0].as_uint()
+            cycles = num_writes * (duration + 1)
+            write_lengths = np.empty(2 * num_writes, dtype=np.int64)
+            write_lengths[0::2] = duration
+            write_lengths[1::2] = 1
+            op_lengths = np.full(num_writes, duration + 1, dtype=np.int64)
+            waveforms = self.waveforms
+            waveforms["write"].extend(np.tile([1, 0], num_writes),
+                                      write_lengths)
+            waveforms["read"].append(0, cycles)
+            waveforms["config_addr_out"].extend(entries[:, 0], op_lengths)
+            waveforms["config_data_out"].extend(entries[:, 1], op_lengths)
+            for name in ("stall", "reset_out", "config_data_to_jtag"):
+                waveforms[name].append(_as_int(getattr(self, name)[-1]),
+                                       cycles)
+            addr, data = entries[-1]
+            self.read = [0]
+            self.write = [0]
+            self.config_addr_out = [BitVector(int(addr), config_addr_width)]
+            self.config_data_out = [BitVector(int(data), config_data_width)]
+
+        def __record(self):
+            # appends the lists produced by the last op to the waveforms. all
+            # outputs hold their last value until the longest one is done
+            cycles = max(len(getattr(self, name)) for name in _OUTPUTS)
+            for name in _OUTPUTS:
+                values = getattr(self, name)
+                lengths = [1] * len(values)
+                lengths[-1] += cycles - len(values)
+                self.waveforms[name].extend([_as_int(value) for value in
+                                             values], lengths)
+                setattr(self, name, [values[-1]])
+
         def read_gc_reg(self, addr):
-            if (addr == GCRegAddr.TST_ADDR):
-                out = self.TST[-1]
-            elif (addr == GCRegAddr.STALL_ADDR):
-                out = self.stall[-1]
-            elif (addr == GCRegAddr.CLK_SEL_ADDR):
-                out = self.clk_sel[-1]
-            elif (addr == GCRegAddr.RW_DELAY_SEL_ADDR):
-                out = self.rw_delay_sel[-1]
-            elif (addr == GCRegAddr.CLK_SWITCH_DELAY_SEL_ADDR):
-                out = self.clk_switch_delay_sel[-1]
-            else:
+            if not isinstance(addr, GCRegAddr):
                 raise ValueError("Reading from invalid GC_reg address")
+            out = self.regs[addr.value][-1]
             self.config_data_to_jtag = [BitVector(out, config_data_width)]
 
         def write_gc_reg(self, addr, data):
-            if (addr == GCRegAddr.TST_ADDR):
-                self.TST = [BitVector(data, config_data_width)]
-            elif (addr == GCRegAddr.STALL_ADDR):
-                self.stall = [BitVector(data, self.num_stall_domains)]
-            elif (addr == GCRegAddr.CLK_SEL_ADDR):
-                self.clk_sel = [BitVector(data, 1)]
-            elif (addr == GCRegAddr.RW_DELAY_SEL_ADDR):
-                self.rw_delay_sel = [BitVector(data, config_data_width)]
-            elif (addr == GCRegAddr.CLK_SWITCH_DELAY_SEL_ADDR):
-                self.clk_switch_delay_sel = [BitVector(data, 1)]
-            else:
+            if not isinstance(addr, GCRegAddr):
                 raise ValueError("Writing to invalid GC_reg address")
+            self.regs[addr.value] = [BitVector(data,
+                                               self.reg_widths[addr.value])]
 
         def global_reset(self, data):
             if (data > 0):
@@ -137,45 +344,49 @@ def gen_global_controller(config_data_width: int,
             self.write = [self.write[-1]]
             self.config_data_to_jtag = [self.config_data_to_jtag[-1]]
 
-        def __call__(self, **kwargs):
+        def __step(self, op, addr, data):
             self.__cleanup()
+            if self.compact and op is GCOp.CONFIG_WRITE:
+                self.__config_write_many(np.array(
+                    [[_as_int(addr), _as_int(data)]], dtype=np.int64))
+                return
+            handler = _OP_HANDLERS[op.value]
+            if handler is None:
+                raise ValueError(f"Invalid op {op}")
+            handler(self, addr, data)
+            if self.compact:
+                self.__record()
+
+        def run(self, ops):
+            """
+            Replays a sequence of (op, addr, data) tuples. addr and data are
+            ignored by ops that do not use them. The compact model applies
+            runs of CONFIG_WRITE in bulk.
+            """
+            if not self.compact:
+                for op, addr, data in ops:
+                    self.__step(op, addr, data)
+                return self
+            writes = []
+            for op, addr, data in ops:
+                if op is GCOp.CONFIG_WRITE:
+                    writes.append((_as_int(addr), _as_int(data)))
+                    if len(writes) == _CHUNK_SIZE:
+                        self.config_write_many(writes)
+                        writes = []
+                    continue
+                if writes:
+                    self.config_write_many(writes)
+                    writes = []
+                self.__step(op, addr, data)
+            if writes:
+                self.config_write_many(writes)
+            return self
+
+        def __call__(self, **kwargs):
             # Op is mandatory. Other args are optional
-            op = kwargs['op']
-            if 'data' in kwargs:
-                data = kwargs['data']
-            if 'addr' in kwargs:
-                addr = kwargs['addr']
-            # Decode op
-            if (op == GCOp.CONFIG_WRITE):
-                self.config_write(addr, data)
-            if (op == GCOp.CONFIG_READ):
-                self.config_read(addr)
-            elif (op == GCOp.WRITE_A050):
-                self.wr_A050()
-            elif (op == GCOp.WRITE_TST):
-                self.write_gc_reg(GCRegAddr.TST_ADDR, data)
-            elif (op == GCOp.READ_TST):
-                self.read_gc_reg(GCRegAddr.TST_ADDR)
-            elif (op == GCOp.GLOBAL_RESET):
-                self.global_reset(data)
-            elif (op == GCOp.WRITE_STALL):
-                self.write_gc_reg(GCRegAddr.STALL_ADDR, data)
-            elif (op == GCOp.READ_STALL):
-                self.read_gc_reg(GCRegAddr.STALL_ADDR)
-            elif (op == GCOp.ADVANCE_CLK):
-                self.advance_clk(addr, data)
-            elif (op == GCOp.READ_CLK_DOMAIN):
-                self.read_gc_reg(GCRegAddr.CLK_SEL_ADDR)
-            elif (op == GCOp.SWITCH_CLK):
-                self.write_gc_reg(GCRegAddr.CLK_SEL_ADDR, data)
-            elif (op == GCOp.WRITE_RW_DELAY_SEL):
-                self.write_gc_reg(GCRegAddr.RW_DELAY_SEL_ADDR, data)
-            elif (op == GCOp.READ_RW_DELAY_SEL):
-                self.read_gc_reg(GCRegAddr.RW_DELAY_SEL_ADDR)
-            elif (op == GCOp.WRITE_CLK_SWITCH_DELAY_SEL):
-                self.write_gc_reg(GCRegAddr.CLK_SWITCH_DELAY_SEL_ADDR, data)
-            elif (op == GCOp.READ_CLK_SWITCH_DELAY_SEL):
-                self.read_gc_reg(GCRegAddr.CLK_SWITCH_DELAY_SEL_ADDR)
+            self.__step(kwargs["op"], kwargs.get("addr", None),
+                        kwargs.get("data", None))
             return self
 
     return _GlobalController
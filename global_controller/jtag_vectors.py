@@ -0,0 +1,162 @@
+"""Streaming JTAG vectors that load a bitstream through the global controller
+
+Every config write is issued by scanning the config data, address and op
+registers of the global controller's TAP (see config_time.jtag_scans), and
+the next op waits until the controller is done with the previous one.
+
+Two formats are supported:
+  * svf: Serial Vector Format, one SIR/SDR/RUNTEST statement per line
+  * binary: a fixed header followed by packed little-endian records of
+    (kind, width, value). The header stores the IR width, the number of
+    records and the crc32 of the records.
+
+Vectors are generated and written incrementally, so memory use does not
+depend on the size of the bitstream.
+"""
+import struct
+import zlib
+from typing import Iterable, Tuple
+from global_controller.global_controller import RW_DELAY_SEL_RESET
+from global_controller.config_time import jtag_scans, gc_write_cycles, \
+    ir_scan_cycles, dr_scan_cycles, JTAG_IR_WIDTH, JTAG_SYNC_CYCLES
+
+
+# record kinds
+IR_SCAN = 0
+DR_SCAN = 1
+IDLE = 2
+
+BINARY_MAGIC = b"GJV\x00"
+BINARY_VERSION = 1
+# magic, version, ir width, num_records, crc32
+_HEADER = struct.Struct("<4sHHII")
+# kind, width, value
+_RECORD = struct.Struct("<BxHI")
+# number of records packed per write() call
+_CHUNK_SIZE = 4096
+
+FORMATS = ("svf", "binary")
+
+
+def jtag_vectors(bitstream: Iterable[Tuple[int, int]],
+                 rw_delay: int = RW_DELAY_SEL_RESET,
+                 config_data_width: int = 32, config_addr_width: int = 32,
+                 config_op_width: int = 5):
+    """
+    Yields the (kind, width, value) records that load @bitstream: IR scans,
+    DR scans and IDLE records of value TCK cycles in Run-Test/Idle. Scans
+    start and end in Run-Test/Idle, and the IR is only scanned when it
+    changes.
+    """
+    gc_busy = gc_write_cycles(rw_delay) + JTAG_SYNC_CYCLES
+    busy = 0
+    instruction = None
+    for scans in jtag_scans(bitstream, config_data_width, config_addr_width,
+                            config_op_width):
+        cycles = 0
+        current = instruction
+        for scan_instruction, _, width in scans:
+            if scan_instruction != current:
+                cycles += ir_scan_cycles()
+                current = scan_instruction
+            cycles += dr_scan_cycles(width)
+        # wait for the previous write before the op is updated
+        if busy > cycles:
+            yield IDLE, 0, busy - cycles
+        for scan_instruction, value, width in scans:
+            if scan_instruction != instruction:
+                yield IR_SCAN, JTAG_IR_WIDTH, scan_instruction
+                instruction = scan_instruction
+            yield DR_SCAN, width, value
+        busy = gc_busy
+    if busy:
+        yield IDLE, 0, busy
+
+
+def vector_cycles(kind: int, width: int, value: int):
+    if kind == IR_SCAN:
+        return ir_scan_cycles(width)
+    elif kind == DR_SCAN:
+        return dr_scan_cycles(width)
+    return value
+
+
+def _write_svf(f, vectors):
+    f.write("TRST OFF;\nENDIR IDLE;\nENDDR IDLE;\nSTATE RESET;\n"
+            "STATE IDLE;\n")
+    lines = []
+    for kind, width, value in vectors:
+        if kind == IR_SCAN:
+            lines.append(f"SIR {width} TDI ({value:0{(width + 3) // 4}X});")
+        elif kind == DR_SCAN:
+            lines.append(f"SDR {width} TDI ({value:0{(width + 3) // 4}X});")
+        else:
+            lines.append(f"RUNTEST {value} TCK;")
+        if len(lines) == _CHUNK_SIZE:
+            f.write("\n".join(lines) + "\n")
+            lines = []
+    if lines:
+        f.write("\n".join(lines) + "\n")
+
+
+def _write_binary(f, vectors):
+    # the header is patched once the records have been streamed out
+    f.write(b"\x00" * _HEADER.size)
+    num_records = 0
+    crc = 0
+    chunk = bytearray()
+    for record in vectors:
+        chunk += _RECORD.pack(*record)
+        num_records += 1
+        if len(chunk) == _CHUNK_SIZE * _RECORD.size:
+            crc = zlib.crc32(chunk, crc)
+            f.write(chunk)
+            chunk = bytearray()
+    if chunk:
+        crc = zlib.crc32(chunk, crc)
+        f.write(chunk)
+    f.seek(0)
+    f.write(_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, JTAG_IR_WIDTH,
+                         num_records, crc))
+
+
+def write_jtag_vectors(filename: str, bitstream: Iterable[Tuple[int, int]],
+                       fmt: str = "svf", rw_delay: int = RW_DELAY_SEL_RESET,
+                       config_data_width: int = 32,
+                       config_addr_width: int = 32,
+                       config_op_width: int = 5):
+    """
+    Writes the JTAG vectors that load @bitstream, any iterable of
+    (addr, data), without materializing either of them.
+    """
+    vectors = jtag_vectors(bitstream, rw_delay, config_data_width,
+                           config_addr_width, config_op_width)
+    if fmt == "svf":
+        with open(filename, "w+") as f:
+            _write_svf(f, vectors)
+    elif fmt == "binary":
+        with open(filename, "wb+") as f:
+            _write_binary(f, vectors)
+    else:
+        raise ValueError(f"Unknown JTAG vector format {fmt}")
+
+
+def read_binary_vectors(filename: str):
+    """Yields the (kind, width, value) records of a binary vector file"""
+    with open(filename, "rb") as f:
+        magic, version, _, num_records, checksum = \
+            _HEADER.unpack(f.read(_HEADER.size))
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError(f"{filename} is not a binary JTAG vector file")
+        crc = 0
+        remaining = num_records
+        while remaining:
+            count = min(remaining, _CHUNK_SIZE)
+            chunk = f.read(count * _RECORD.size)
+            if len(chunk) != count * _RECORD.size:
+                raise ValueError(f"{filename} is truncated")
+            crc = zlib.crc32(chunk, crc)
+            yield from _RECORD.iter_unpack(chunk)
+            remaining -= count
+        if crc != checksum:
+            raise ValueError(f"{filename} is corrupted")
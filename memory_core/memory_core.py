@@ -1,5 +1,6 @@
 from gemstone.common.configurable_model import ConfigurableModel
 import functools
+import numpy as np
 from hwtypes import BitVector
 from enum import Enum
 import magma as m
@@ -14,13 +15,42 @@ class Mode(Enum):
     SRAM = 2
 
 
+def _dtype(data_width):
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if data_width <= np.iinfo(dtype).bits:
+            return dtype
+    return object
+
+
+# words per lazily allocated page of Memory
+_PAGE_BITS = 8
+_PAGE_SIZE = 1 << _PAGE_BITS
+
+
 class Memory:
+    """
+    Stores words in numpy pages of the narrowest unsigned type that holds
+    @data_width bits. Pages are allocated on first write and untouched
+    addresses read as zero, so memory use scales with the addresses written
+    and reset() is O(1). read()/write() take and return single words, while
+    read_many()/write_many() operate on whole arrays of addresses.
+    """
     def __init__(self, address_width, data_width):
         self.address_width = address_width
         self.data_width = data_width
         self.data_depth = 1 << address_width
-        self.memory = {BitVector(i, address_width): BitVector(0, data_width)
-                       for i in range(self.data_depth)}
+        self.dtype = _dtype(data_width)
+        self.reset()
+
+    def reset(self):
+        self.__pages = {}
+
+    def __page(self, index):
+        page = self.__pages.get(index, None)
+        if page is None:
+            page = np.zeros(_PAGE_SIZE, dtype=self.dtype)
+            self.__pages[index] = page
+        return page
 
     def check_addr(fn):
         @functools.wraps(fn)
@@ -30,9 +60,20 @@ class Memory:
             return fn(self, addr, *args)
         return wrapped
 
+    def __check_addrs(self, addrs):
+        addrs = np.asarray(addrs, dtype=np.int64)
+        if addrs.size and (addrs.min() < 0 or addrs.max() >= self.data_depth):
+            bad = addrs[(addrs < 0) | (addrs >= self.data_depth)][0]
+            raise AssertionError(f"Address ({bad}) must be within "
+                                 f"range(0, {self.data_depth})")
+        return addrs
+
     @check_addr
     def read(self, addr):
-        return self.memory[addr]
+        addr = int(addr)
+        page = self.__pages.get(addr >> _PAGE_BITS, None)
+        value = 0 if page is None else int(page[addr & (_PAGE_SIZE - 1)])
+        return BitVector(value, self.data_width)
 
     @check_addr
     def write(self, addr, value):
@@ -42,7 +83,44 @@ class Memory:
         if isinstance(value, int):
             assert value.bit_length() <= self.data_width, \
                 f"value.bit_length() must be <= {self.data_width}"
-        self.memory[addr] = value
+        addr = int(addr)
+        self.__page(addr >> _PAGE_BITS)[addr & (_PAGE_SIZE - 1)] = int(value)
+
+    def read_many(self, addrs):
+        """Returns the words at @addrs as a numpy array"""
+        addrs = self.__check_addrs(addrs)
+        result = np.zeros(addrs.shape, dtype=self.dtype)
+        pages = addrs >> _PAGE_BITS
+        for index in np.unique(pages):
+            page = self.__pages.get(int(index), None)
+            if page is not None:
+                mask = pages == index
+                result[mask] = page[addrs[mask] & (_PAGE_SIZE - 1)]
+        return result
+
+    def write_many(self, addrs, values):
+        """
+        Writes @values to @addrs in order, i.e. the last write to an address
+        wins.
+        """
+        addrs = self.__check_addrs(addrs)
+        values = np.asarray(values)
+        assert addrs.shape == values.shape, \
+            "addrs and values must have the same shape"
+        if values.size:
+            assert int(values.min()) >= 0 and \
+                int(values.max()) >> self.data_width == 0, \
+                f"values must fit in {self.data_width} bits"
+        values = values.astype(self.dtype)
+        # numpy does not define which of repeated indices is assigned last
+        _, last = np.unique(addrs[::-1], return_index=True)
+        last = len(addrs) - 1 - last
+        addrs, values = addrs[last], values[last]
+        pages = addrs >> _PAGE_BITS
+        for index in np.unique(pages):
+            mask = pages == index
+            self.__page(int(index))[addrs[mask] & (_PAGE_SIZE - 1)] = \
+                values[mask]
 
 
 def gen_memory_core(data_width: int, data_depth: int):
@@ -58,32 +136,192 @@ def gen_memory_core(data_width: int, data_depth: int):
             self.config[addr] = data
 
         def reset(self):
-            address_width = m.bitutils.clog2(data_depth)
-            self.memory = Memory(address_width, data_width)
+            if not hasattr(self, "memory"):
+                address_width = m.bitutils.clog2(data_depth)
+                self.memory = Memory(address_width, data_width)
+            # contents read as zero after a reset
+            self.memory.reset()
             self.data_out = fault.UnknownValue
             self.read_data = fault.UnknownValue
             # TODO: Is the initial config actually 0?
             self.configure(CONFIG_ADDR, BitVector(0, 32))
-            # Ignore these signals for now
             self.valid_out = fault.UnknownValue
             self.chain_out = fault.UnknownValue
             self.chain_valid_out = fault.UnknownValue
             self.almost_full = fault.UnknownValue
             self.almost_empty = fault.UnknownValue
+            # Ignore these signals for now
             self.read_data_sram = fault.UnknownValue
             self.read_data_linebuf = fault.UnknownValue
+            self.__flush()
+
+        def __flush(self):
+            # line buffer and FIFO state. the n-th word written is kept at
+            # n % depth in self.memory
+            self.__count = 0
+            self.__num_pushed = 0
+            self.__num_popped = 0
+            # data_out keeps its value across idle cycles and flushes
+            self.__last_out = 0
 
         def read(self, addr):
+            # line buffers and FIFOs have no address: a read is a step with
+            # ren high, which pops a FIFO and leaves the result in data_out
+            # and valid_out
             if self.__mode == Mode.SRAM:
                 self.data_out = self.memory.read(addr)
             else:
-                raise NotImplementedError(self.__mode)  # pragma: nocover
+                self.step(ren=1)
 
         def write(self, addr, data):
+            # and a write is a step that pushes @data
             if self.__mode == Mode.SRAM:
                 self.memory.write(addr, data)
             else:
-                raise NotImplementedError(self.__mode)  # pragma: nocover
+                self.step(data_in=int(data), wen=1)
+
+        def step(self, data_in=0, wen=0, ren=0, chain_in=0, chain_wen_in=0,
+                 flush=0):
+            """
+            Advances a line buffer or FIFO by one input step and returns
+            (data_out, valid_out). The outputs are also left in the
+            corresponding attributes, as read() does. See step_many() for
+            what is modeled.
+            """
+            data_out, valid_out = self.step_many([data_in], [wen], [ren],
+                                                 [chain_in], [chain_wen_in],
+                                                 [flush])
+            return BitVector(int(data_out[0]), data_width), \
+                bool(valid_out[0])
+
+        def step_many(self, data_in, wen, ren=None, chain_in=None,
+                      chain_wen_in=None, flush=None):
+            """
+            Advances a line buffer or FIFO by one input step per element of
+            the input arrays and returns the (data_out, valid_out) arrays.
+            Omitted inputs are held low.
+
+            This is a functional, transaction-level model: it reproduces the
+            sequence of valid output words and when they become available
+            relative to the inputs, not the RTL's cycle timing. The pipeline
+            latency of the RTL (e.g. its SRAM read and output registers) is
+            not modeled, so outputs appear earlier than in the RTL and the
+            two are compared on the valid-qualified stream.
+            """
+            num_cycles = len(data_in)
+
+            def inputs(values):
+                if values is None:
+                    return np.zeros(num_cycles, dtype=np.int64)
+                return np.asarray(values, dtype=np.int64)
+            data_in, wen, ren = inputs(data_in), inputs(wen), inputs(ren)
+            if self.__field(19, 1):
+                # chaining feeds the memory from the previous tile
+                data_in, wen = inputs(chain_in), inputs(chain_wen_in)
+            flush = inputs(flush)
+            data_out = np.zeros(num_cycles, dtype=self.memory.dtype)
+            valid_out = np.zeros(num_cycles, dtype=bool)
+            # flushes split the inputs into independent runs
+            start = 0
+            for end in list(np.flatnonzero(flush)) + [num_cycles]:
+                if end > start:
+                    run = slice(start, end)
+                    if self.__mode == Mode.LINE_BUFFER:
+                        self.__line_buffer(data_in[run], wen[run] != 0,
+                                           data_out[run], valid_out[run])
+                    elif self.__mode == Mode.FIFO:
+                        self.__fifo(data_in[run], wen[run] != 0,
+                                    ren[run] != 0, data_out[run],
+                                    valid_out[run])
+                    else:
+                        raise NotImplementedError(self.__mode)
+                if end < num_cycles:
+                    last_out = self.__last_out
+                    self.__flush()
+                    self.__last_out = data_out[end] = last_out
+                start = end + 1
+            if num_cycles:
+                self.data_out = BitVector(int(data_out[-1]), data_width)
+                self.valid_out = bool(valid_out[-1])
+                self.chain_out = self.data_out
+                self.chain_valid_out = self.valid_out
+                self.almost_full = self.__count >= self.__depth
+                self.almost_empty = self.__count <= self.__field(16, 4)
+            return data_out, valid_out
+
+        def __line_buffer(self, data_in, wen, data_out, valid_out):
+            # a delay line of depth words: once full, every write pushes out
+            # the word written depth writes earlier
+            depth = self.__depth
+            words = data_in[wen]
+            first = self.__num_pushed
+            pushed = first + np.arange(len(words))
+            delayed = pushed - depth
+            outputs = np.zeros(len(words), dtype=self.memory.dtype)
+            # words written before this call are still in the ring
+            old = (delayed >= 0) & (delayed < first)
+            outputs[old] = self.memory.read_many(delayed[old] % depth)
+            new = delayed >= first
+            outputs[new] = words[delayed[new] - first]
+            # only the last depth words survive in the ring
+            tail = slice(max(len(words) - depth, 0), len(words))
+            self.memory.write_many(pushed[tail] % depth, words[tail])
+            self.__num_pushed += len(words)
+            self.__count = min(self.__num_pushed, depth)
+            valid_out[wen] = delayed >= 0
+            data_out[wen] = outputs
+            self.__hold(data_out, valid_out)
+
+        def __fifo(self, data_in, wen, ren, data_out, valid_out):
+            # the occupancy does not depend on the data, so the cycles that
+            # pop are found first and the words are then moved in bulk
+            depth = self.__depth
+            count = self.__count
+            for cycle in range(len(data_in)):
+                # a word can not be read in the cycle it is written
+                if ren[cycle] and count:
+                    valid_out[cycle] = True
+                    count -= 1
+                if wen[cycle]:
+                    assert count < depth, "FIFO overflow"
+                    count += 1
+            self.__count = count
+            # the n-th word popped is the n-th word pushed
+            words = data_in[wen]
+            first = self.__num_pushed
+            popped = self.__num_popped + np.arange(np.count_nonzero(valid_out))
+            outputs = np.zeros(len(popped), dtype=self.memory.dtype)
+            old = popped < first
+            outputs[old] = self.memory.read_many(popped[old] % depth)
+            outputs[~old] = words[popped[~old] - first]
+            pushed = first + np.arange(len(words))
+            tail = slice(max(len(words) - depth, 0), len(words))
+            self.memory.write_many(pushed[tail] % depth, words[tail])
+            self.__num_pushed += len(words)
+            self.__num_popped += len(popped)
+            data_out[valid_out] = outputs
+            self.__hold(data_out, valid_out)
+
+        def __hold(self, data_out, valid_out):
+            # data_out keeps its value while valid_out is low
+            if not len(data_out):
+                return
+            last = np.where(valid_out, np.arange(len(data_out)), -1)
+            last = np.maximum.accumulate(last)
+            data_out[:] = np.where(last >= 0, data_out[np.maximum(last, 0)],
+                                   self.__last_out)
+            self.__last_out = int(data_out[-1])
+
+        @property
+        def __depth(self):
+            depth = self.__field(3, 13)
+            assert 0 < depth <= data_depth, \
+                f"depth ({depth}) must be within range(1, {data_depth + 1})"
+            return depth
+
+        def __field(self, lo, width):
+            return (self.config[CONFIG_ADDR].as_uint() >> lo) & \
+                ((1 << width) - 1)
 
         def read_and_write(self, addr, data):
             # write takes priority
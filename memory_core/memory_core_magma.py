@@ -1,3 +1,4 @@
+import functools
 import magma
 import mantle
 from gemstone.common.configurable import ConfigurationType
@@ -10,6 +11,50 @@ from memory_core import memory_core_genesis2
 from typing import List
 
 
+# config_mem fields, (low bit, width), see memory_core.vp. enable_chain
+# aliases the top bit of almost_count in the RTL
+_CONFIG_FIELDS = {
+    "mode": (0, 2),
+    "tile_en": (2, 1),
+    "depth": (3, 13),
+    "almost_count": (16, 4),
+    "chain_enable": (19, 1),
+}
+# same encoding as memory_core.Mode, keyed by the cgralib.Mem mode names
+_MODES = {
+    "linebuffer": 0,
+    "fifo": 1,
+    "sram": 2,
+}
+
+
+def mem_config_bitstream(instr):
+    # @instr holds the cgralib.Mem modargs of an instance. everything is
+    # packed into config_mem, register 0 of the first feature. this does not
+    # need an elaborated core, so cached designs use it directly
+    values = {"tile_en": 1, "almost_count": 0, "chain_enable": 0}
+    values.update(instr)
+    values["mode"] = _MODES[values["mode"]]
+    data = 0
+    for name, (lo, width) in _CONFIG_FIELDS.items():
+        value = int(values.get(name, 0))
+        assert 0 <= value < (1 << width), \
+            f"{name} ({value}) does not fit in {width} bits"
+        data |= value << lo
+    return [(0, data)]
+
+
+@functools.lru_cache(maxsize=None)
+def _memory_core_circuit(data_width, data_depth):
+    # running Genesis2 and parsing its output is the bulk of building a
+    # MemCore, so every core with the same parameters shares the declared
+    # circuit, as PeakCore shares its wrapped PE
+    wrapper = memory_core_genesis2.memory_core_wrapper
+    param_mapping = memory_core_genesis2.param_mapping
+    generator = wrapper.generator(param_mapping, mode="declare")
+    return generator(data_width=data_width, data_depth=data_depth)
+
+
 class MemCore(ConfigurableCore):
     def __init__(self, data_width, data_depth):
         super().__init__(8, 32)
@@ -32,11 +77,7 @@ class MemCore(ConfigurableCore):
         # "sub"-feature of this core.
         self.ports.pop("read_config_data")
 
-        wrapper = memory_core_genesis2.memory_core_wrapper
-        param_mapping = memory_core_genesis2.param_mapping
-        generator = wrapper.generator(param_mapping, mode="declare")
-        circ = generator(data_width=self.data_width,
-                         data_depth=self.data_depth)
+        circ = _memory_core_circuit(self.data_width, self.data_depth)
         self.underlying = FromMagma(circ)
 
         self.wire(self.ports.data_in, self.underlying.ports.data_in)
@@ -131,7 +172,7 @@ class MemCore(ConfigurableCore):
                       self.ports[f"config_en_{sram_index}"])
 
     def get_config_bitstream(self, instr):
-        raise NotImplementedError()
+        return mem_config_bitstream(instr)
 
     def instruction_type(self):
         raise NotImplementedError()
@@ -68,6 +68,13 @@ class _PeakWrapper(metaclass=_PeakWrapperMeta):
     def assemble(self, instr):
         return self.__asm(instr)
 
+    def config_words(self, instr):
+        # naive partitioning of the assembled instruction into 32-bit words,
+        # one per config register
+        config = self.assemble(instr)
+        num_config = math.ceil(self.__instr_width / 32)
+        return [int(config[i * 32:i * 32 + 32]) for i in range(num_config)]
+
 
 class PeakCore(ConfigurableCore):
     def __init__(self, peak_generator):
@@ -115,15 +122,11 @@ class PeakCore(ConfigurableCore):
 
     def get_config_bitstream(self, instr):
         assert isinstance(instr, self.wrapper.instruction_type())
-        config = self.wrapper.assemble(instr)
-        config_width = self.wrapper.instruction_width()
-        num_config = math.ceil(config_width / 32)
         instr_name = self.wrapper.instruction_name()
         result = []
-        for i in range(num_config):
+        for i, data in enumerate(self.wrapper.config_words(instr)):
             name = f"{instr_name}_{i}"
             reg_idx = self.registers[name].addr
-            data = int(config[i * 32:i * 32 + 32])
             result.append((reg_idx, data))
         return result
 
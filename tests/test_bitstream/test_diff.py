@@ -0,0 +1,27 @@
+from bitstream import diff_bitstream, encode_addr
+
+
+def apply(state, bitstream):
+    state = dict(state)
+    state.update(bitstream)
+    return state
+
+
+def test_diff_bitstream():
+    a = encode_addr(0, 0, 1, 1)
+    b = encode_addr(1, 0, 1, 1)
+    c = encode_addr(0, 0, 2, 1)
+    d = encode_addr(0, 0, 3, 1)
+    previous = [(a, 0x1), (a, 0x10), (b, 0x5), (c, 0x7)]
+    current = [(a, 0x11), (c, 0x3), (d, 0x9)]
+    diff = diff_bitstream(previous, current)
+    # a is unchanged, b is no longer used and goes back to reset
+    assert diff == [(b, 0x0), (c, 0x3), (d, 0x9)]
+    # switching apps reaches the same state as a full configuration
+    state = apply({}, [(a, 0x11), (b, 0x5), (c, 0x7)])
+    assert apply(state, diff) == apply({a: 0, b: 0, c: 0, d: 0},
+                                       [(a, 0x11), (c, 0x3), (d, 0x9)])
+    # non-zero reset values
+    assert diff_bitstream([(b, 0x5)], [], reset_values={b: 0x2}) == \
+        [(b, 0x2)]
+    assert diff_bitstream([], [(b, 0x2)], reset_values={b: 0x2}) == []
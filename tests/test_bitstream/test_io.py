@@ -0,0 +1,57 @@
+import os
+import random
+import tempfile
+import pytest
+from bitstream import read_bitstream, write_bitstream, BinaryBitstream
+
+
+def random_bitstream(num_entries):
+    return [(random.randrange(0, 2**32), random.randrange(0, 2**32))
+            for _ in range(num_entries)]
+
+
+def test_text_bitstream():
+    bitstream = [(0x01000102, 0x3), (0xFF0A0B0C, 0xDEADBEEF)]
+    with tempfile.TemporaryDirectory() as tempdir:
+        filename = os.path.join(tempdir, "app.bs")
+        write_bitstream(filename, iter(bitstream))
+        with open(filename) as f:
+            assert f.read() == "01000102 00000003\nFF0A0B0C DEADBEEF"
+        assert read_bitstream(filename) == bitstream
+
+
+@pytest.mark.parametrize("num_entries", [0, 1, 4096, 10000])
+def test_binary_bitstream(num_entries):
+    bitstream = random_bitstream(num_entries)
+    with tempfile.TemporaryDirectory() as tempdir:
+        filename = os.path.join(tempdir, "app.bin")
+        # generators are streamed out without being materialized
+        write_bitstream(filename, (entry for entry in bitstream), "binary",
+                        width=32, height=16, tile_id_width=16)
+        assert os.path.getsize(filename) == 20 + 8 * num_entries
+        with BinaryBitstream(filename) as bs:
+            assert (bs.width, bs.height, bs.tile_id_width) == (32, 16, 16)
+            assert len(bs) == num_entries
+            assert bs.verify()
+            assert list(bs) == bitstream
+            if num_entries:
+                assert bs[-1] == bitstream[-1]
+                assert bs[num_entries // 2] == bitstream[num_entries // 2]
+        assert read_bitstream(filename) == bitstream
+
+
+def test_binary_bitstream_corruption():
+    with tempfile.TemporaryDirectory() as tempdir:
+        filename = os.path.join(tempdir, "app.bin")
+        write_bitstream(filename, random_bitstream(10), "binary")
+        with open(filename, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        with BinaryBitstream(filename) as bs:
+            assert not bs.verify()
+        with open(filename, "r+b") as f:
+            f.truncate(os.path.getsize(filename) - 4)
+        with pytest.raises(ValueError):
+            BinaryBitstream(filename)
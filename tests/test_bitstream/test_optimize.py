@@ -0,0 +1,40 @@
+from bitstream import compact_bitstream, decode_addr, encode_addr
+from bitstream.optimize import merge_writes, drop_reset_writes, sort_by_tile
+
+
+def test_config_addr():
+    addr = encode_addr(3, 1, 2, 5)
+    assert addr == (3 << 24) | (1 << 16) | (2 << 8) | 5
+    assert decode_addr(addr) == (3, 1, 2, 5)
+
+
+def test_merge_writes():
+    sram_addr = encode_addr(0, 1, 1, 1)
+    bitstream = [(encode_addr(0, 0, 1, 1), 0x3),
+                 (encode_addr(0, 0, 1, 1), 0x30),
+                 (sram_addr, 0x12),
+                 (sram_addr, 0x21)]
+    result = merge_writes(bitstream, skip=[sram_addr])
+    assert result == [(encode_addr(0, 0, 1, 1), 0x33), (sram_addr, 0x21)]
+
+
+def test_drop_reset_writes():
+    bitstream = [(0x100, 0), (0x200, 1), (0x300, 2)]
+    assert drop_reset_writes(bitstream) == [(0x200, 1), (0x300, 2)]
+    assert drop_reset_writes(bitstream, {0x100: 1, 0x300: 2}) == \
+        [(0x100, 0), (0x200, 1)]
+
+
+def test_compact_bitstream():
+    bitstream = [(encode_addr(1, 0, 2, 1), 0x1),
+                 (encode_addr(0, 0, 1, 2), 0x4),
+                 (encode_addr(0, 0, 1, 1), 0x0),
+                 (encode_addr(2, 0, 1, 2), 0x1),
+                 (encode_addr(0, 0, 1, 2), 0x8)]
+    assert compact_bitstream(bitstream) == [(encode_addr(0, 0, 1, 2), 0xC),
+                                            (encode_addr(2, 0, 1, 2), 0x1),
+                                            (encode_addr(1, 0, 2, 1), 0x1)]
+    assert len(compact_bitstream(bitstream, drop_reset=False)) == 4
+    # sorting is stable per tile and register
+    assert sort_by_tile([(0x0102, 1), (0x0101, 2)]) == [(0x0101, 2),
+                                                        (0x0102, 1)]
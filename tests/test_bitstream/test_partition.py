@@ -0,0 +1,28 @@
+from bitstream import encode_addr, partition_bitstream, channel_summary
+from bitstream.partition import config_channel
+
+
+def test_config_channel():
+    # 8 columns, 2 channels of 4 columns each
+    assert [config_channel(encode_addr(0, 0, x, 1), 8, 2)
+            for x in range(8)] == [0, 0, 0, 0, 1, 1, 1, 1]
+    # columns that do not divide evenly end up in the last channel
+    assert config_channel(encode_addr(0, 0, 6, 1), 7, 3) == 2
+
+
+def test_partition_bitstream():
+    bitstream = [(encode_addr(0, 0, 5, 1), 1),
+                 (encode_addr(0, 0, 0, 1), 2),
+                 (encode_addr(1, 0, 5, 2), 3),
+                 (encode_addr(0, 0, 3, 2), 4),
+                 (encode_addr(0, 0, 7, 2), 5)]
+    partitions = partition_bitstream(bitstream, 8, 2)
+    assert [data for _, data in partitions[0]] == [2, 4]
+    assert [data for _, data in partitions[1]] == [1, 3, 5]
+    summary = channel_summary(partitions)
+    assert summary["counts"] == [2, 3]
+    assert summary["total"] == 5
+    assert summary["max"] == 3
+    assert summary["imbalance"] == 3 / 2.5
+    assert summary["speedup"] == 5 / 3
+    assert channel_summary([[], []])["speedup"] == 1.0
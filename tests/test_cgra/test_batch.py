@@ -0,0 +1,94 @@
+import os
+import tempfile
+from bitstream import read_bitstream
+from cgra.batch import find_apps, compile_batch
+
+
+class FakeInterconnect:
+    tile_id_width = 16
+
+
+class FakeGarnet:
+    def __init__(self):
+        self.rewrite_rules = None
+        self.width = 4
+        self.height = 2
+        self.interconnect = FakeInterconnect()
+
+    def set_rewrite_rules(self, rewrite_rules):
+        self.rewrite_rules = rewrite_rules
+
+    def initialize_mapper(self, rewrite_rules=None):
+        self.context_used = False
+
+    def reset_mapper(self, profiler=None):
+        with profiler.span("load_rewrite_rules"):
+            self.context_used = False
+
+    def compile(self, halide_src, profiler=None, compact=False):
+        # a second app in the same coreir context collides with the first
+        assert not self.context_used, "global.DesignTop already exists"
+        self.context_used = True
+        if "bad" in halide_src:
+            raise ValueError("cannot map")
+        return [(len(halide_src), 42)]
+
+
+def test_find_apps():
+    with tempfile.TemporaryDirectory() as tempdir:
+        for name in ("b.json", "a.json", "c.txt"):
+            with open(os.path.join(tempdir, name), "w+") as f:
+                f.write("{}")
+        apps = find_apps(tempdir)
+        assert apps == [(os.path.join(tempdir, "a.json"), ""),
+                        (os.path.join(tempdir, "b.json"), "")]
+        manifest = os.path.join(tempdir, "apps.txt")
+        with open(manifest, "w+") as f:
+            f.write("# regression\na.json out/a.bit\n\nb.json\n")
+        apps = find_apps(manifest)
+        assert apps == [(os.path.join(tempdir, "a.json"),
+                         os.path.join(tempdir, "out/a.bit")),
+                        (os.path.join(tempdir, "b.json"), "")]
+
+
+def test_compile_batch():
+    with tempfile.TemporaryDirectory() as tempdir:
+        # more apps than workers, so workers compile several apps each
+        apps = [("a.json", ""), ("bad.json", ""), ("c.json", ""),
+                ("d.json", ""), ("e.json", "")]
+        results = list(compile_batch(FakeGarnet, apps, tempdir,
+                                     num_workers=2))
+        assert len(results) == 5
+        errors = {app: error for app, _, error, _ in results}
+        for app in ("a.json", "c.json", "d.json", "e.json"):
+            assert errors[app] is None
+        # resetting the mapper is part of an app's timings
+        assert any("load_rewrite_rules" in timings for _, _, _, timings in
+                   results)
+        assert "cannot map" in errors["bad.json"]
+        bitstream = read_bitstream(os.path.join(tempdir, "a.bit"))
+        assert bitstream == [(len("a.json"), 42)]
+
+
+def test_compile_batch_output_dirs():
+    with tempfile.TemporaryDirectory() as tempdir:
+        output = os.path.join(tempdir, "out", "a.bit")
+        results = list(compile_batch(FakeGarnet, [("a.json", output)],
+                                     os.path.join(tempdir, "default")))
+        assert results[0][2] is None
+        assert read_bitstream(output) == [(len("a.json"), 42)]
+
+
+class BrokenGarnet(FakeGarnet):
+    def initialize_mapper(self, rewrite_rules=None):
+        raise RuntimeError("no rewrite rules")
+
+
+def test_compile_batch_init_error():
+    with tempfile.TemporaryDirectory() as tempdir:
+        apps = [("a.json", ""), ("b.json", "")]
+        results = list(compile_batch(BrokenGarnet, apps, tempdir,
+                                     num_workers=2))
+        # every app reports the error instead of the batch hanging
+        assert len(results) == 2
+        assert all("no rewrite rules" in error for _, _, error, _ in results)
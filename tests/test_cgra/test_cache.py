@@ -0,0 +1,94 @@
+import tempfile
+import pytest
+from lassen.sim import gen_pe
+import lassen.asm as asm
+from canal.util import IOSide
+from cgra import create_cgra
+from cgra.cache import ElaborationCache, fingerprint, node_key, \
+    _muxed_nodes
+from garnet import Garnet
+
+
+GEOMETRY = {"config_addr_width": 32,
+            "config_addr_reg_width": 8,
+            "tile_id_width": 16}
+
+
+def test_fingerprint():
+    params = dict(width=2, height=2, num_tracks=5, add_pd=True,
+                  mem_ratio=(1, 4))
+    assert fingerprint(**params) == fingerprint(**params)
+    assert fingerprint(**params) != fingerprint(**dict(params, width=4))
+
+
+def test_cached_interconnect():
+    interconnect = create_cgra(2, 2, IOSide.North, num_tracks=2, add_pd=False,
+                               mem_ratio=(1, 2))
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ElaborationCache(cache_dir)
+        cache.store("key", interconnect, GEOMETRY)
+        assert "key" in cache
+        cached = cache.load("key", gen_pe)
+
+    assert cached.tile_id_width == interconnect.tile_id_width
+    for x, y, feat in ((0, 0, 0), (1, 2, 3)):
+        assert cached.get_config_addr(5, feat, x, y) == \
+            interconnect.get_config_addr(5, feat, x, y)
+
+    # every edge into a mux produces the same route bitstream
+    num_edges = 0
+    for tile in interconnect.tile_circuits.values():
+        for node in _muxed_nodes(tile):
+            for src in node.get_conn_in():
+                expected = interconnect.get_route_bitstream(
+                    {"e0": [[src, node]]})
+                route = [cached.parse_node(list(node_key(src))),
+                         cached.parse_node(list(node_key(node)))]
+                assert cached.get_route_bitstream({"e0": [route]}) == \
+                    expected
+                num_edges += 1
+    assert num_edges > 0
+
+    # and every core kind the same placement bitstream
+    instrs = {"PE": asm.add(),
+              "MemCore": {"mode": "sram", "depth": 512},
+              "io_core": {}}
+    kinds = set()
+    for (x, y), tile in interconnect.tile_circuits.items():
+        if tile.core is None:
+            continue
+        instr = instrs[tile.core.name()]
+        assert cached.configure_placement(x, y, instr) == \
+            interconnect.configure_placement(x, y, instr)
+        kinds.add(tile.core.name())
+    assert kinds == set(instrs)
+
+
+def test_garnet_cache_hit():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        Garnet(2, 2, add_pd=False, cache_dir=cache_dir)
+        garnet = Garnet(2, 2, add_pd=False, cache_dir=cache_dir,
+                        bitstream_only=True)
+        assert not garnet.elaborated
+        with pytest.raises(RuntimeError):
+            garnet.circuit()
+        with pytest.raises(RuntimeError):
+            garnet.ports.jtag
+        with pytest.raises(RuntimeError):
+            garnet.global_controller.ports
+
+
+def test_garnet_lazy_fingerprint(monkeypatch):
+    import garnet
+    calls = []
+
+    def counting_fingerprint(**params):
+        calls.append(params)
+        return fingerprint(**params)
+
+    monkeypatch.setattr(garnet, "fingerprint", counting_fingerprint)
+    # without a cache nothing needs the fingerprint at construction
+    instance = Garnet(2, 2, add_pd=False)
+    assert calls == []
+    assert instance.fingerprint == instance.fingerprint
+    assert len(calls) == 1
@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+from cgra.instrument import Profiler, NULL_PROFILER
+
+
+def test_profiler_spans():
+    profiler = Profiler()
+    with profiler.span("compile", app="app.json"):
+        for _ in range(2):
+            with profiler.span("pnr"):
+                pass
+        with profiler.span("map"):
+            sum(range(1000))
+    names = [entry["name"] for entry in profiler.to_json()["spans"]]
+    assert names == ["compile", "pnr", "pnr", "map"]
+    times = profiler.stage_times()
+    assert set(times.keys()) == {"compile", "pnr", "map"}
+    assert times["compile"] >= times["map"]
+    for entry in profiler.spans:
+        if entry["name"] != "compile":
+            assert entry["parent"] == "compile"
+            assert entry["depth"] == 1
+        assert entry["process_max_rss_kb"] > 0
+        assert entry["max_rss_growth_kb"] >= 0
+        # a span raises the peak at least as much as its children
+        assert profiler.spans[-1]["max_rss_growth_kb"] >= \
+            entry["max_rss_growth_kb"]
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        filename = os.path.join(tempdir, "trace.json")
+        profiler.dump(filename)
+        with open(filename) as f:
+            trace = json.load(f)
+        events = trace["traceEvents"]
+        assert len(events) == 4
+        assert all(e["ph"] == "X" for e in events)
+        assert events[0]["args"]["app"] == "app.json"
+
+
+def test_null_profiler():
+    with NULL_PROFILER.span("compile"):
+        pass
+    assert NULL_PROFILER.spans == []
+    assert NULL_PROFILER.stage_times() == {}
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+import pytest
+from cgra.netlist import build_netlist
+from garnet import _MEM_PORTS
+
+
+class FakeInstance:
+    def __init__(self, name, module_name, widths):
+        self.name = name
+        self.module = SimpleNamespace(name=module_name)
+        self.widths = widths
+        self.selects = 0
+
+    def select(self, port):
+        self.selects += 1
+        return SimpleNamespace(type=SimpleNamespace(size=self.widths[port]))
+
+
+def fake_app(instances, connections):
+    conns = [SimpleNamespace(source=src, sink=dst) for src, dst in
+             connections]
+    return SimpleNamespace(definition=SimpleNamespace(instances=instances),
+                           directed_module=SimpleNamespace(connections=conns))
+
+
+TAGS = {"io16": "I", "PE": "p", "Mem": "m"}
+
+
+def test_build_netlist():
+    io_in = FakeInstance("io_in", "io16", {"out": 16})
+    pe = FakeInstance("pe", "PE", {"alu_res": 16})
+    mem = FakeInstance("mem", "Mem", {"rdata": 16})
+    io_out = FakeInstance("io_out", "io16", {})
+    app = fake_app([io_in, pe, mem, io_out],
+                   [(("io_in", "out"), ("pe", "data0")),
+                    (("io_in", "out"), ("pe", "data1")),
+                    (("pe", "alu_res"), ("mem", "wdata")),
+                    (("mem", "rdata"), ("io_out", "in"))])
+
+    def core_port(tag, port):
+        return {"wdata": "data_in", "rdata": "data_out"}.get(port, port) \
+            if tag == "m" else port
+
+    netlist, bus, id_to_name = build_netlist(app, TAGS.get, core_port)
+    assert id_to_name == {"I0": "io_in", "p1": "pe", "m2": "mem",
+                          "I3": "io_out"}
+    assert netlist == {"e0": [("I0", "out"), ("p1", "data0"),
+                              ("p1", "data1")],
+                       "e1": [("p1", "alu_res"), ("m2", "data_in")],
+                       "e2": [("m2", "data_out"), ("I3", "in")]}
+    assert bus == {"e0": 16, "e1": 16, "e2": 16}
+
+
+def test_width_cache():
+    pes = [FakeInstance(f"pe{i}", "PE", {"alu_res": 16}) for i in range(4)]
+    connections = [((f"pe{i}", "alu_res"), (f"pe{i + 1}", "data0"))
+                   for i in range(3)]
+    netlist, bus, _ = build_netlist(fake_app(pes, connections), TAGS.get)
+    assert len(netlist) == 3
+    # widths are looked up once per module port, not per net
+    assert sum(pe.selects for pe in pes) == 1
+
+
+def test_mem_read_write():
+    # waddr and raddr both map to the single addr_in port of MemCore
+    io_in = FakeInstance("io_in", "io16", {"out": 16})
+    pe = FakeInstance("pe", "PE", {"alu_res": 16})
+    mem = FakeInstance("mem", "Mem", {"rdata": 16})
+    app = fake_app([io_in, pe, mem],
+                   [(("io_in", "out"), ("mem", "wdata")),
+                    (("io_in", "out"), ("mem", "waddr")),
+                    (("pe", "alu_res"), ("mem", "raddr"))])
+
+    def core_port(tag, port):
+        return _MEM_PORTS.get(port, port) if tag == "m" else port
+
+    with pytest.raises(ValueError):
+        build_netlist(app, TAGS.get, core_port)
+    # a memory that is only read or written is fine
+    app.directed_module.connections.pop()
+    netlist, _, _ = build_netlist(app, TAGS.get, core_port)
+    assert netlist == {"e0": [("I0", "out"), ("m2", "data_in"),
+                              ("m2", "addr_in")]}
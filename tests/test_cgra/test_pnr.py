@@ -0,0 +1,91 @@
+import os
+import stat
+import tempfile
+import pytest
+from cgra.pnr import permute_netlist, routing_stats, score, \
+    _load_id_to_name, pnr_multi_seed, ShellBackend
+
+
+NETLIST = {"e0": [("I0", "out"), ("p1", "data0"), ("p2", "data0")],
+           "e1": [("p1", "alu_res"), ("p2", "data1")],
+           "e2": [("p2", "alu_res"), ("I3", "in")]}
+BUS = {"e0": 16, "e1": 16, "e2": 1}
+ID_TO_NAME = {"I0": "in", "p1": "add", "p2": "mul", "I3": "out"}
+
+
+def test_seed_zero_is_identity():
+    assert permute_netlist(NETLIST, BUS, ID_TO_NAME, 0) == \
+        (NETLIST, BUS, ID_TO_NAME)
+
+
+def test_permute_netlist():
+    netlist, bus, id_to_name = permute_netlist(NETLIST, BUS, ID_TO_NAME, 3)
+    assert sorted(id_to_name.values()) == sorted(ID_TO_NAME.values())
+    name_to_id = {name: blk_id for blk_id, name in id_to_name.items()}
+    # the same nets connect the same instances, and tags are kept
+    expected = set()
+    for net_id, net in NETLIST.items():
+        expected.add((BUS[net_id],
+                      tuple((ID_TO_NAME[blk], port) for blk, port in net)))
+    result = set()
+    for net_id, net in netlist.items():
+        result.add((bus[net_id],
+                    tuple((id_to_name[blk], port) for blk, port in net)))
+    assert result == expected
+    assert name_to_id["in"][0] == "I" and name_to_id["add"][0] == "p"
+    # the permutation only depends on the seed
+    assert permute_netlist(NETLIST, BUS, ID_TO_NAME, 3) == \
+        (netlist, bus, id_to_name)
+
+
+def test_routing_stats():
+    routing = {"e0": [[("PORT", "out"), ("SB", 0), ("REG", "T0"),
+                       ("SB", 1), ("SB", 2), ("PORT", "data0")]],
+               "e1": [[("PORT", "alu_res"), ("PORT", "data1")]]}
+    stats = routing_stats(routing)
+    assert stats == {"critical_path": 3, "wire_length": 8, "registers": 1}
+    assert score(stats) < score({"critical_path": 3, "wire_length": 9,
+                                 "registers": 0})
+
+
+def test_load_id_to_name():
+    with tempfile.TemporaryDirectory() as tempdir:
+        filename = os.path.join(tempdir, "app.packed")
+        with open(filename, "w") as f:
+            f.write("Netlists:\ne0: (I0, out)\t(p1, data0)\n\n"
+                    "ID to Names:\nI0: io_in\np1: add_340_341\n\n"
+                    "Netlist Bus:\ne0: 16\n")
+        assert _load_id_to_name(filename) == {"I0": "io_in",
+                                              "p1": "add_340_341"}
+
+
+class RecordingShellBackend(ShellBackend):
+    # loads the results without the PnR libraries
+    def load_results(self, base, interconnect):
+        with open(base + ".args") as f:
+            args = f.read().split()
+        return {"I0": (0, 0)}, {}, {"I0": args}
+
+
+def test_shell_backend_seed():
+    with tempfile.TemporaryDirectory() as tempdir:
+        script = os.path.join(tempdir, "scripts", "pnr_flow.sh")
+        os.makedirs(os.path.dirname(script))
+        with open(script, "w") as f:
+            f.write('#!/bin/sh\necho "$@" > "${2%.json}.args"\n')
+        os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+        app_file = os.path.join(tempdir, "app.json")
+        backend = RecordingShellBackend(tempdir)
+
+        best, attempts = pnr_multi_seed(
+            backend, None, NETLIST, BUS, ID_TO_NAME, [0],
+            lambda placement, routing, id_to_name: id_to_name, 1,
+            "design.info", app_file)
+        assert attempts[0][2] is None
+        # the app and the graph dump reach the flow script
+        assert best[2] == {"I0": ["design.info", app_file]}
+
+        # the script ignores the permuted netlist, so seeds are rejected
+        with pytest.raises(ValueError):
+            pnr_multi_seed(backend, None, NETLIST, BUS, ID_TO_NAME, [0, 1],
+                           None, 1, "design.info", app_file)
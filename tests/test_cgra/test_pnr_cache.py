@@ -0,0 +1,78 @@
+import os
+import tempfile
+from cgra.cache import PnRCache, dump_routing, dump_pnr_once
+
+
+class FakeInterconnect:
+    def __init__(self, fail=False):
+        self.num_dumps = 0
+        self.fail = fail
+
+    def parse_node(self, node):
+        return tuple(node)
+
+    def dump_pnr(self, dir_name, design_name):
+        self.num_dumps += 1
+        with open(os.path.join(dir_name, design_name + ".info"), "w+") as f:
+            f.write("layout=\n")
+        if self.fail:
+            raise KeyboardInterrupt()
+
+
+NETLIST = {"e0": [("I0", "out"), ("p1", "data0")]}
+BUS = {"e0": 16}
+
+
+def test_key():
+    key = PnRCache.key(NETLIST, BUS, "array")
+    # tuples and lists canonicalize to the same key
+    assert key == PnRCache.key({"e0": [["I0", "out"], ["p1", "data0"]]},
+                               BUS, "array")
+    assert key != PnRCache.key(NETLIST, {"e0": 1}, "array")
+    assert key != PnRCache.key(NETLIST, BUS, "other array")
+    assert key != PnRCache.key(NETLIST, BUS, "array", seeds=4)
+
+
+def test_store_load():
+    placement = {"I0": (0, 0), "p1": (1, 1)}
+    routing = {"e0": [[("PORT", "out", 0, 0, 16), ("SB", 0, 1, 0, 3, 1, 16),
+                       ("PORT", "data0", 1, 1, 16)]]}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = PnRCache(cache_dir)
+        key = cache.key(NETLIST, BUS, "array")
+        assert cache.load(key, FakeInterconnect()) is None
+        id_to_name = {"I0": "in", "p1": "add"}
+        cache.store(key, 3, placement, dump_routing(routing), id_to_name)
+        assert cache.load(key, FakeInterconnect()) == \
+            (3, placement, routing, id_to_name)
+
+
+def test_dump_pnr_once():
+    interconnect = FakeInterconnect()
+    with tempfile.TemporaryDirectory() as tempdir:
+        dir_name = os.path.join(tempdir, "pnr")
+        info_file = dump_pnr_once(interconnect, dir_name, "garnet", "a")
+        assert info_file == os.path.join(dir_name, "garnet.info")
+        assert os.path.isfile(info_file)
+        dump_pnr_once(interconnect, dir_name, "garnet", "a")
+        assert interconnect.num_dumps == 1
+        # a different design is dumped again
+        dump_pnr_once(interconnect, dir_name, "garnet", "b")
+        assert interconnect.num_dumps == 2
+
+
+def test_dump_pnr_once_interrupted():
+    with tempfile.TemporaryDirectory() as tempdir:
+        dir_name = os.path.join(tempdir, "pnr")
+        dump_pnr_once(FakeInterconnect(), dir_name, "garnet", "a")
+        # the dump of another design is interrupted half way
+        try:
+            dump_pnr_once(FakeInterconnect(fail=True), dir_name, "garnet",
+                          "b")
+        except KeyboardInterrupt:
+            pass
+        # so neither design is considered dumped
+        for key in ("a", "b"):
+            interconnect = FakeInterconnect()
+            dump_pnr_once(interconnect, dir_name, "garnet", key)
+            assert interconnect.num_dumps == 1
@@ -0,0 +1,68 @@
+import tempfile
+from cgra import rewrite_rules
+from cgra.rewrite_rules import RewriteRuleCache, rules_fingerprint, \
+    ALUConstraint, discover_rules_parallel
+
+
+def gen_fake_pe(family):
+    return family
+
+
+def constraint_a(inst):
+    return True
+
+
+def constraint_b(inst):
+    return False
+
+
+def test_rules_fingerprint():
+    key = rules_fingerprint(gen_fake_pe, [constraint_a], 16)
+    assert key == rules_fingerprint(gen_fake_pe, [constraint_a], 16)
+    assert key != rules_fingerprint(gen_fake_pe, [constraint_a], 32)
+    assert key != rules_fingerprint(gen_fake_pe, [constraint_b], 16)
+    assert key != rules_fingerprint(gen_fake_pe, [], 16)
+
+
+def test_rewrite_rule_cache():
+    rules = [{"name": "add", "ibinding": [], "obinding": []}]
+    with tempfile.TemporaryDirectory() as tempdir:
+        cache = RewriteRuleCache(tempdir)
+        assert cache.load("key") is None
+        cache.store("key", rules)
+        assert cache.load("key") == rules
+        assert RewriteRuleCache(tempdir).load("key") == rules
+
+
+class FakeMapper:
+    def __init__(self, context):
+        self.constraints = []
+
+    def add_discover_constraint(self, constraint):
+        self.constraints.append(constraint)
+
+    def discover_peak_rewrite_rules(self, width, serialize=False):
+        opcode = self.constraints[-1].opcode
+        # every partition rediscovers the shared "const" rule, each with a
+        # different instruction
+        return [{"name": opcode, "width": width},
+                {"name": "const", "instr": opcode}]
+
+
+def test_discover_rules_parallel(monkeypatch):
+    monkeypatch.setattr(rewrite_rules, "LassenMapper", FakeMapper)
+    partitions = [ALUConstraint(opcode) for opcode in ("Add", "Sub", "Mul")]
+    progress = []
+
+    def record(done, total, partition, num_rules, seconds):
+        progress.append((done, total, num_rules))
+
+    rules = discover_rules_parallel(partitions, [constraint_a], 16,
+                                    num_workers=2, progress=record)
+    names = sorted(rule["name"] for rule in rules)
+    assert names == ["Add", "Mul", "Sub", "const"]
+    # the rule of the first partition is kept, however workers finish
+    assert {"name": "const", "instr": "Add"} in rules
+    assert discover_rules_parallel(partitions, [constraint_a], 16,
+                                   num_workers=3) == rules
+    assert sorted(progress) == [(1, 3, 2), (2, 3, 2), (3, 3, 2)]
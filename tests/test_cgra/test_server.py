@@ -0,0 +1,82 @@
+import io
+import json
+import os
+import tempfile
+import pytest
+from cgra.server import CompileServer
+
+
+class FakeGarnet:
+    def __init__(self):
+        self.mapper_initalized = False
+        self.rewrite_rules = None
+        self.apps = []
+        self.contexts = 0
+
+    def initialize_mapper(self, rewrite_rules=None):
+        self.mapper_initalized = True
+        self.contexts += 1
+
+    def reset_mapper(self, profiler=None):
+        with profiler.span("load_rewrite_rules"):
+            self.contexts += 1
+
+    def compile(self, halide_src, profiler=None, compact=False):
+        if halide_src == "bad.json":
+            raise ValueError("cannot map")
+        self.apps.append(halide_src)
+        with profiler.span("map"):
+            pass
+        return [(0x01000102, 0x3), (0x00000102, 0x1)]
+
+
+def test_compile_server():
+    garnet = FakeGarnet()
+    server = CompileServer(garnet)
+    assert garnet.mapper_initalized
+    requests = [{"id": 0, "op": "ping"},
+                {"id": 1, "op": "compile", "app": "app.json"},
+                {"id": 2, "op": "compile", "app": "bad.json"},
+                {"id": 3, "op": "compile", "app": "app2.json"},
+                {"id": 4, "op": "shutdown"},
+                {"id": 5, "op": "ping"}]
+    rfile = io.StringIO("\n".join([json.dumps(r) for r in requests]) + "\n")
+    wfile = io.StringIO()
+    assert not server.serve(rfile, wfile)
+    responses = [json.loads(line) for line in
+                 wfile.getvalue().splitlines()]
+    # requests after shutdown are not served
+    assert [r["id"] for r in responses] == [0, 1, 2, 3, 4]
+    assert responses[0]["result"] == "pong"
+    assert responses[1]["bitstream"] == [[0x01000102, 0x3], [0x00000102, 0x1]]
+    assert "map" in responses[1]["timings"]
+    assert "cannot map" in responses[2]["error"]
+    assert garnet.apps == ["app.json", "app2.json"]
+    # every app after the first is mapped in a fresh context, which is
+    # part of the request's timings
+    assert garnet.contexts == 3
+    assert "reset_mapper" not in responses[1]["timings"]
+    assert "load_rewrite_rules" in responses[3]["timings"]
+
+
+def test_bad_request():
+    server = CompileServer(FakeGarnet())
+    rfile = io.StringIO('[1, 2]\n"ping"\n{"op": \n{"id": 5, "op": "ping"}\n')
+    wfile = io.StringIO()
+    assert server.serve(rfile, wfile)
+    responses = [json.loads(line) for line in
+                 wfile.getvalue().splitlines()]
+    assert len(responses) == 4
+    assert all("error" in r and r["id"] is None for r in responses[:3])
+    assert responses[3] == {"id": 5, "result": "pong"}
+
+
+def test_serve_unix_keeps_files():
+    server = CompileServer(FakeGarnet())
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = os.path.join(tempdir, "app.json")
+        with open(path, "w") as f:
+            f.write("{}")
+        with pytest.raises(FileExistsError):
+            server.serve_unix(path)
+        assert os.path.isfile(path)
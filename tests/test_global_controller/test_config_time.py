@@ -0,0 +1,36 @@
+from bitstream.util import encode_addr
+from global_controller.global_controller import gen_global_controller
+from global_controller.config_time import estimate_config_time, \
+    fastest_path, gc_write_cycles, ir_scan_cycles, dr_scan_cycles, \
+    JTAG_SYNC_CYCLES
+
+
+def test_config_time_jtag():
+    addr = encode_addr(0, 1, 0, 1)
+    # the second write only changes the data, the third one only the addr
+    bitstream = [(addr, 1), (addr, 2), (addr + 1, 2)]
+    estimate = estimate_config_time(bitstream, width=4)
+    full = 3 * ir_scan_cycles() + 2 * dr_scan_cycles(32) + dr_scan_cycles(5)
+    partial = 2 * ir_scan_cycles() + dr_scan_cycles(32) + dr_scan_cycles(5)
+    assert estimate["jtag"] == full + 2 * partial + gc_write_cycles() + \
+        JTAG_SYNC_CYCLES
+
+
+def test_config_time_paths():
+    width = 16
+    bitstream = [(encode_addr(0, 0, x, 1), x) for x in range(width)
+                 for _ in range(10)]
+    estimate = estimate_config_time(bitstream, width=width)
+    assert estimate["writes"] == len(bitstream)
+    assert estimate["channels"] == [40] * 4
+    # the global controller is busy for as many cycles as the model records
+    gc = gen_global_controller(32, 32, 5)(compact=True)
+    gc.config_write_many(bitstream)
+    assert gc.cycles == len(bitstream) * gc_write_cycles()
+    assert estimate["axi"] >= gc.cycles
+    assert estimate["glb"] < estimate["axi"] < estimate["jtag"]
+    assert fastest_path(estimate, 10e6, 500e6)[0] == "glb"
+    # with a slow controller the scans wait for the previous write
+    slow = estimate_config_time(bitstream, width=width, rw_delay=200)
+    assert slow["jtag"] > estimate["jtag"]
+    assert slow["axi"] == len(bitstream) * (2 + gc_write_cycles(200))
@@ -114,3 +114,30 @@ def test_global_controller_functional_model():
     # Write to and read from the rest of the GC regs
     for reg in GCRegAddr:
         check_gc_reg(gc_inst, reg)
+
+
+def test_global_controller_run():
+    gc = gen_global_controller(32, 32, 5)
+    ops = [(GCOp.WRITE_TST, None, 0x1234), (GCOp.WRITE_RW_DELAY_SEL, None, 5),
+           (GCOp.CONFIG_WRITE, 0x10, 0x20), (GCOp.CONFIG_WRITE, 0x11, 0x21),
+           (GCOp.READ_TST, None, None), (GCOp.CONFIG_WRITE, 0x12, 0x22),
+           (GCOp.NOP, None, None)]
+    called = gc()
+    for op, addr, data in ops:
+        called(op=op, addr=addr, data=data)
+    replayed = gc().run(ops)
+    for reg in GCRegAddr:
+        assert replayed.regs[reg.value][-1] == called.regs[reg.value][-1]
+    assert replayed.TST[-1] == 0x1234
+    assert replayed.config_data_to_jtag[-1] == 0x1234
+    assert replayed.config_addr_out[-1] == 0x12
+
+    # the compact model batches the config writes
+    called = gc(compact=True)
+    for op, addr, data in ops:
+        called(op=op, addr=addr, data=data)
+    replayed = gc(compact=True).run(ops)
+    assert replayed.cycles == called.cycles
+    for name, waveform in replayed.waveforms.items():
+        assert list(waveform.expand()) == \
+            list(called.waveforms[name].expand())
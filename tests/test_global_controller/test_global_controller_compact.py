@@ -0,0 +1,79 @@
+import numpy as np
+from global_controller.global_controller import \
+    gen_global_controller, GCOp, Waveform
+
+
+def test_waveform_merges_runs():
+    waveform = Waveform(capacity=1)
+    waveform.extend([1, 1, 0, 2], [2, 3, 0, 1])
+    waveform.append(2, 4)
+    waveform.append(5)
+    assert list(waveform.values) == [1, 2, 5]
+    assert list(waveform.lengths) == [5, 5, 1]
+    assert len(waveform) == 11
+    assert waveform.value_at(4) == 1
+    assert waveform.value_at(5) == 2
+    assert waveform.value_at(10) == 5
+    assert list(waveform.expand()) == [1] * 5 + [2] * 5 + [5]
+    # a run of the last value followed by another value
+    waveform.extend([5, 5, 3], [1, 2, 1])
+    assert list(waveform.values) == [1, 2, 5, 3]
+    assert list(waveform.lengths) == [5, 5, 4, 1]
+
+
+def test_global_controller_compact_matches_lists():
+    GlobalController = gen_global_controller(32, 32, 5)
+    bitstream = [(0x00010203, 0x1), (0x00020304, 0x2), (0x00030405, 0x3)]
+    ops = [(GCOp.WRITE_RW_DELAY_SEL, 0, 3), (GCOp.WRITE_STALL, 0, 0xF),
+           (GCOp.GLOBAL_RESET, 0, 5)] + \
+        [(GCOp.CONFIG_WRITE, addr, data) for addr, data in bitstream] + \
+        [(GCOp.WRITE_A050, 0, 0), (GCOp.ADVANCE_CLK, 0x3, 4)]
+
+    # expand the per-op lists of the original model by hand
+    reference = GlobalController()
+    expected = {name: [] for name in ("stall", "reset_out",
+                                      "config_addr_out", "config_data_out",
+                                      "read", "write",
+                                      "config_data_to_jtag")}
+    for op, addr, data in ops:
+        reference(op=op, addr=addr, data=data)
+        cycles = max(len(getattr(reference, name)) for name in expected)
+        for name, trace in expected.items():
+            values = [int(value) for value in getattr(reference, name)]
+            trace.extend(values + [values[-1]] * (cycles - len(values)))
+        # reset_out is not trimmed by the original model
+        reference.reset_out = [reference.reset_out[-1]]
+
+    compact = GlobalController(compact=True)
+    for op, addr, data in ops:
+        compact(op=op, addr=addr, data=data)
+    assert compact.cycles == len(expected["write"])
+    for name, trace in expected.items():
+        assert list(compact.waveforms[name].expand()) == trace
+    assert compact.stall[-1] == reference.stall[-1]
+    assert compact.config_addr_out[-1] == bitstream[-1][0]
+
+
+def test_global_controller_configure_bulk():
+    GlobalController = gen_global_controller(32, 32, 5)
+    num_writes = 100000
+    addrs = np.arange(num_writes)
+    bitstream = zip(addrs.tolist(), (addrs * 3).tolist())
+    gc = GlobalController(compact=True)
+    gc.config_write_many(bitstream)
+    rw_delay = gc.rw_delay_sel[0].as_uint()
+    assert gc.cycles == num_writes * (rw_delay + 1)
+    write = gc.waveforms["write"]
+    assert write.num_runs == 2 * num_writes
+    assert write.value_at(rw_delay - 1) == 1
+    assert write.value_at(rw_delay) == 0
+    assert gc.waveforms["read"].num_runs == 1
+    data = gc.waveforms["config_data_out"]
+    assert list(data.values[:3]) == [0, 3, 6]
+    assert gc.config_data_out[-1] == (num_writes - 1) * 3
+
+    # the list based model applies the same writes one op at a time
+    gc = GlobalController()
+    gc.config_write_many([(1, 2), (3, 4)])
+    assert gc.config_addr_out[-1] == 3
+    assert gc.config_data_out[-1] == 4
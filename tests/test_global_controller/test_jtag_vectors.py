@@ -0,0 +1,46 @@
+import os
+import tempfile
+from bitstream.util import encode_addr
+from global_controller.config_time import estimate_config_time, \
+    JTAG_CFG_DATA, JTAG_CFG_ADDR, JTAG_CFG_INST
+from global_controller.global_controller import GCOp
+from global_controller.jtag_vectors import jtag_vectors, vector_cycles, \
+    write_jtag_vectors, read_binary_vectors, IR_SCAN, DR_SCAN, IDLE
+
+
+def test_jtag_vectors():
+    addr = encode_addr(0, 1, 0, 1)
+    bitstream = [(addr, 0xA), (addr + 1, 0xA)]
+    vectors = list(jtag_vectors(bitstream, rw_delay=100))
+    op = GCOp.CONFIG_WRITE.value
+    assert vectors[:6] == [(IR_SCAN, 5, JTAG_CFG_DATA), (DR_SCAN, 32, 0xA),
+                           (IR_SCAN, 5, JTAG_CFG_ADDR), (DR_SCAN, 32, addr),
+                           (IR_SCAN, 5, JTAG_CFG_INST), (DR_SCAN, 5, op)]
+    # the second write waits for the first one and only rescans the addr
+    assert vectors[6][0] == IDLE
+    assert vectors[7:] == [(IR_SCAN, 5, JTAG_CFG_ADDR),
+                           (DR_SCAN, 32, addr + 1),
+                           (IR_SCAN, 5, JTAG_CFG_INST), (DR_SCAN, 5, op),
+                           (IDLE, 0, 105)]
+    estimate = estimate_config_time(bitstream, width=4, rw_delay=100)
+    assert sum(vector_cycles(*vector) for vector in vectors) == \
+        estimate["jtag"]
+
+
+def test_write_jtag_vectors():
+    bitstream = [(encode_addr(0, 0, x, y), x * y) for x in range(8)
+                 for y in range(1, 9)]
+    vectors = list(jtag_vectors(bitstream))
+    with tempfile.TemporaryDirectory() as tempdir:
+        filename = os.path.join(tempdir, "app.svf")
+        write_jtag_vectors(filename, iter(bitstream))
+        with open(filename) as f:
+            lines = f.read().splitlines()
+        assert lines[5:8] == ["SIR 5 TDI (08);", "SDR 32 TDI (00000000);",
+                              "SIR 5 TDI (0A);"]
+        assert len(lines) == 5 + len(vectors)
+        assert lines[-1].startswith("RUNTEST")
+
+        filename = os.path.join(tempdir, "app.jv")
+        write_jtag_vectors(filename, iter(bitstream), "binary")
+        assert list(read_binary_vectors(filename)) == vectors
@@ -1,5 +1,6 @@
 import subprocess
 import os
+import pytest
 
 
 GARNET_FILENAME = os.path.join(os.path.dirname(__file__),
@@ -19,3 +20,43 @@ def test_garnet():
         "--output", outfile
     ], cwd=garnet_root)
     assert os.path.isfile(outfile)
+
+
+class _PnRDone(Exception):
+    pass
+
+
+def test_shell_backend_mapped_app(tmp_path):
+    from garnet import Garnet
+    from cgra.pnr import ShellBackend
+
+    # the flow script fails unless it is given the mapped app: the unmapped
+    # one still instantiates coreir.mul
+    script = tmp_path / "scripts" / "pnr_flow.sh"
+    script.parent.mkdir()
+    script.write_text('#!/bin/sh\n'
+                      'grep -q DesignTop "$2" || exit 1\n'
+                      'grep -q \'"coreir.mul"\' "$2" && exit 1\n'
+                      'echo "$@" > "${2%.json}.args"\n')
+    script.chmod(0o755)
+    calls = []
+
+    class Backend(ShellBackend):
+        def load_results(self, base, interconnect):
+            with open(base + ".args") as f:
+                calls.append(f.read().split())
+            raise _PnRDone()
+
+    pnr_dir = tmp_path / "pnr"
+    garnet = Garnet(4, 2, add_pd=False, pnr_backend=Backend(str(tmp_path)),
+                    pnr_dir=str(pnr_dir))
+    with pytest.raises(_PnRDone):
+        garnet.compile(os.path.join(os.path.dirname(__file__),
+                                    "pointwise.json"))
+    assert len(calls) == 1
+    info_file, app_file = calls[0]
+    assert os.path.dirname(info_file) == str(pnr_dir)
+    # the results are written to a work dir in the PnR dir, which is
+    # removed afterwards, not next to the input
+    assert os.path.dirname(os.path.dirname(app_file)) == str(pnr_dir)
+    assert not os.path.exists(app_file)
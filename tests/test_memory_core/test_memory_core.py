@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+from hwtypes import BitVector
+from memory_core.memory_core import Memory, gen_memory_core, Mode
+
+
+def configure(model, mode, depth, almost_count=0):
+    config_data = mode.value | (1 << 2) | (depth << 3) | (almost_count << 16)
+    model.configure(BitVector(0, 32), BitVector(config_data, 32))
+
+
+def test_memory_read_write():
+    memory = Memory(address_width=4, data_width=16)
+    assert memory.read(3) == BitVector(0, 16)
+    memory.write(3, 0xBEEF)
+    memory.write(BitVector(4, 4), BitVector(42, 16))
+    assert memory.read(3) == BitVector(0xBEEF, 16)
+    assert memory.read(4) == BitVector(42, 16)
+    with pytest.raises(AssertionError):
+        memory.write(16, 0)
+    with pytest.raises(AssertionError):
+        memory.write(0, 1 << 16)
+
+
+def test_memory_reset():
+    memory = Memory(address_width=16, data_width=16)
+    memory.write_many([0, 40000], [1, 2])
+    memory.reset()
+    assert memory.read(0) == BitVector(0, 16)
+    assert (memory.read_many([0, 40000, 65535]) == 0).all()
+
+    model = gen_memory_core(16, 1024)()
+    configure(model, Mode.SRAM, 8)
+    model.write(3, 7)
+    model.reset()
+    configure(model, Mode.SRAM, 8)
+    model.read(3)
+    assert model.data_out == BitVector(0, 16)
+
+
+def test_memory_read_write_many():
+    memory = Memory(address_width=10, data_width=16)
+    addrs = np.arange(0, 1024, 3)
+    memory.write_many(addrs, addrs * 7)
+    assert (memory.read_many(addrs) == addrs * 7).all()
+    assert (memory.read_many([1, 2]) == 0).all()
+    assert memory.read(9) == BitVector(63, 16)
+    # writes are applied in order
+    memory.write_many([5, 5, 5], [1, 2, 3])
+    assert memory.read(5) == BitVector(3, 16)
+    with pytest.raises(AssertionError):
+        memory.read_many([0, 1024])
+    with pytest.raises(AssertionError):
+        memory.write_many([0], [1 << 16])
+
+
+def test_line_buffer():
+    model = gen_memory_core(16, 1024)()
+    configure(model, Mode.LINE_BUFFER, 4)
+    data_in = np.arange(1, 21)
+    wen = np.arange(20) % 3 != 0
+    data_out, valid_out = model.step_many(data_in, wen)
+    # every write after the first four pushes out the word written four
+    # writes earlier
+    written = data_in[wen]
+    assert (data_out[valid_out] == written[:-4]).all()
+    assert (valid_out == wen & (np.cumsum(wen) > 4)).all()
+    assert model.almost_full
+
+    # single steps and split batches match
+    model.reset()
+    configure(model, Mode.LINE_BUFFER, 4)
+    for i in range(7):
+        out, valid = model.step(int(data_in[i]), int(wen[i]))
+        assert out == BitVector(int(data_out[i]), 16)
+        assert valid == valid_out[i]
+    rest_out, rest_valid = model.step_many(data_in[7:], wen[7:])
+    assert (rest_out == data_out[7:]).all()
+    assert (rest_valid == valid_out[7:]).all()
+
+
+def test_line_buffer_flush():
+    model = gen_memory_core(16, 1024)()
+    configure(model, Mode.LINE_BUFFER, 2)
+    data_out, valid_out = model.step_many([1, 2, 3, 4, 5, 6, 7],
+                                          [1, 1, 1, 0, 1, 1, 1],
+                                          flush=[0, 0, 0, 1, 0, 0, 0])
+    assert list(valid_out) == [False, False, True, False, False, False,
+                               True]
+    assert list(data_out) == [0, 0, 1, 1, 1, 1, 5]
+
+
+def test_fifo():
+    model = gen_memory_core(16, 1024)()
+    configure(model, Mode.FIFO, 4, almost_count=1)
+    for i in range(1, 4):
+        assert model.step(i, wen=1) == (BitVector(0, 16), False)
+    assert not model.almost_empty
+    assert model.step(4, wen=1, ren=1) == (BitVector(1, 16), True)
+    data_out, valid_out = model.step_many([0] * 4, [0] * 4, [1] * 4)
+    assert list(data_out) == [2, 3, 4, 4]
+    assert list(valid_out) == [True, True, True, False]
+    assert model.almost_empty and not model.almost_full
+    with pytest.raises(AssertionError):
+        model.step_many(range(5), [1] * 5)
+
+
+def test_single_access():
+    # read() and write() are single steps in the streaming modes
+    model = gen_memory_core(16, 1024)()
+    configure(model, Mode.FIFO, 4)
+    for i in range(1, 4):
+        model.write(0, BitVector(i, 16))
+    model.read(0)
+    assert model.data_out == BitVector(1, 16) and model.valid_out
+    model.read(0)
+    assert model.data_out == BitVector(2, 16)
+
+    model.reset()
+    configure(model, Mode.LINE_BUFFER, 2)
+    for i in range(1, 4):
+        model.write(0, i)
+    assert model.data_out == BitVector(1, 16) and model.valid_out
+    model.read(0)
+    # a line buffer only moves on writes
+    assert model.data_out == BitVector(1, 16) and not model.valid_out
@@ -0,0 +1,30 @@
+import pytest
+from memory_core.memory_core_magma import mem_config_bitstream, MemCore, \
+    _memory_core_circuit
+
+
+def test_sram_config():
+    # same layout the genesis2 test configures by hand
+    config = mem_config_bitstream({"mode": "sram", "depth": 8})
+    assert config == [(0, 2 | (1 << 2) | (8 << 3))]
+
+
+def test_linebuffer_config():
+    config = mem_config_bitstream({"mode": "linebuffer", "depth": 64,
+                                   "tile_en": True, "almost_count": 3})
+    assert config == [(0, 0 | (1 << 2) | (64 << 3) | (3 << 16))]
+
+
+def test_config_overflow():
+    with pytest.raises(AssertionError):
+        mem_config_bitstream({"mode": "fifo", "depth": 1 << 13})
+
+
+def test_shared_circuit():
+    # Genesis2 only runs once per parameter set
+    _memory_core_circuit.cache_clear()
+    cores = [MemCore(16, 1024) for _ in range(3)]
+    info = _memory_core_circuit.cache_info()
+    assert info.misses == 1 and info.hits == 2
+    # but every core keeps its own ports and config registers
+    assert cores[0].ports is not cores[1].ports